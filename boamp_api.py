@@ -0,0 +1,374 @@
+import logging
+import os
+import time
+
+import requests
+
+from boamp_http import MAX_RETRIES, backoff_delay
+from boamp_metrics import METRICS
+from boamp_stream import CHUNK_SIZE, export_format, iter_results, iter_text
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://www.boamp.fr/api/explore/v2.1/catalog/datasets/boamp-html/records"
+# Whole-dataset dumps; {fmt} is json or jsonl
+EXPORT_URL = "https://www.boamp.fr/api/explore/v2.1/catalog/datasets/boamp-html/exports/{fmt}"
+
+# Only the columns the scrapers read are requested (ODSQL `select`)
+FETCH_FIELDS = ('idweb', 'dateparution', 'html')
+
+# Notices with less HTML than this are incomplete records; filtered server-side
+MIN_HTML_LENGTH = 100
+BASE_WHERE = 'html IS NOT NULL'
+VALID_HTML_WHERE = f'{BASE_WHERE} AND length(html) > {MIN_HTML_LENGTH}'
+
+# Publication date column used for the server-side date window
+DATE_FIELD = 'dateparution'
+
+# Set once the API has rejected the optional server-side filters (HTTP 400);
+# later pages then use BASE_WHERE and filter on the client only
+_server_filters = {'enabled': True}
+
+
+def server_filters_enabled():
+    """False once the API has rejected the optional filters for this process"""
+    return _server_filters['enabled']
+
+
+def checkpoint_key(record):
+    """(dateparution, idweb) of a record, in the order of a `since` walk
+
+    idweb is not a sequence: as text '25-100000' sorts before '25-99999', so
+    the newest notice cannot be told by its idweb alone. Notices are ordered
+    by publication day first; idweb only breaks ties within a day, compared
+    exactly as the API sorts it, so the walk and the checkpoint agree.
+    """
+    return (record.get(DATE_FIELD) or '', record['idweb'])
+
+
+def newest_checkpoint(records):
+    """Largest checkpoint_key() among records that carry a publication date, or None"""
+    return max((checkpoint_key(r) for r in records if r.get(DATE_FIELD) and r.get('idweb')), default=None)
+
+
+def keyset_where(before=None, after=None, where=BASE_WHERE, published_after=None, published_before=None,
+                 since=None):
+    """Build the ODSQL filter for the idweb window (after, before), both exclusive
+
+    `published_after` and `published_before` (dates or datetimes) add a
+    publication date window [published_after, published_before). `since`,
+    a checkpoint_key() (idweb may be None for the whole day), keeps the
+    notices after it.
+    """
+    clauses = [where] if where else []
+    if since is not None:
+        published, idweb = since
+        if idweb:
+            clauses.append(f"({DATE_FIELD} > date'{published}' OR "
+                           f"({DATE_FIELD} = date'{published}' AND idweb > \"{idweb}\"))")
+        else:
+            clauses.append(f"{DATE_FIELD} >= date'{published}'")
+    if published_after is not None:
+        clauses.append(f"{DATE_FIELD} >= date'{published_after:%Y-%m-%d}'")
+    if published_before is not None:
+        clauses.append(f"{DATE_FIELD} < date'{published_before:%Y-%m-%d}'")
+    if before:
+        clauses.append(f'idweb < "{before}"')
+    if after:
+        clauses.append(f'idweb > "{after}"')
+    return ' AND '.join(clauses)
+
+
+def _get(session, url, params):
+    """Send one records request: (response, start)
+
+    The body is streamed, so a successful request is timed by its Page once
+    the body has been read; failures are timed here.
+    """
+    start = time.perf_counter()
+    try:
+        response = session.get(url, params=params, timeout=30, stream=True)
+    except Exception:
+        METRICS.observe('http_request_seconds', time.perf_counter() - start, endpoint='boamp_records', status='error')
+        raise
+    if response.status_code >= 400:
+        METRICS.observe('http_request_seconds', time.perf_counter() - start, endpoint='boamp_records',
+                        status=response.status_code)
+    return response, start
+
+
+# Failures while reading a streamed body; the page is re-requested from its cursor
+BODY_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.ChunkedEncodingError,
+               requests.exceptions.Timeout)
+
+
+class Page:
+    """One page of API records, decoded one record at a time while iterated
+
+    The response body is streamed: each record is handed out as soon as it
+    has been received and decoded, so a page never sits in memory as raw
+    bytes plus a parsed copy. total_count is set when the decoder reaches it
+    (before the records in OpenDataSoft answers); count and cursor once the
+    page has been consumed. A page can be iterated only once.
+
+    HttpClient only retries until the headers arrive. Should the body fail
+    mid-read (dropped connection, read timeout), `reopen(last, count)`
+    requests the rest of the page from the last record handed out, after the
+    same jittered backoff, up to max_retries times; records are never
+    repeated. http_request_seconds covers each request up to the end of its body.
+
+    Positions are idwebs, or checkpoint_key() pairs for pages walked `by_date`.
+    """
+
+    def __init__(self, response, start=None, reopen=None, max_retries=MAX_RETRIES, by_date=False):
+        self.response = response
+        self.start = time.perf_counter() if start is None else start
+        self.reopen = reopen
+        self.max_retries = max_retries
+        self.by_date = by_date
+        self.meta = {}    # the page's members other than results
+        self.offset = 0   # records received before the current response
+        self.count = 0
+        self.last_idweb = None
+        self.last_published = None
+
+    @property
+    def total_count(self):
+        return self.offset + self.meta.get('total_count', 0)
+
+    @property
+    def last(self):
+        """Position of the last record handed out"""
+        return (self.last_published, self.last_idweb) if self.by_date else self.last_idweb
+
+    @property
+    def cursor(self):
+        """Position to continue from, or None when this was the last page"""
+        return self.last if self.count and self.total_count > self.count else None
+
+    def __iter__(self):
+        try:
+            yield from self._iter_retrying()
+        finally:
+            # Also when the caller stops early
+            close = getattr(self.response, 'close', None)
+            if close:
+                close()
+
+    def _iter_retrying(self):
+        attempt = 0
+        while True:
+            try:
+                for record in self._records():
+                    self.count += 1
+                    self.last_idweb = record.get('idweb')
+                    self.last_published = record.get(DATE_FIELD)
+                    yield record
+                return
+            except BODY_ERRORS as e:
+                self._finish('error')
+                if self.reopen is None or attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                attempt += 1
+                logger.warning(f"Page body failed after {self.count} records ({e.__class__.__name__}), "
+                               f"re-requesting the rest in {delay:.1f}s")
+                METRICS.inc('http_retries', reason='body')
+                time.sleep(delay)
+                reopened = self.reopen(self.last, self.count)
+                if reopened is None:
+                    return    # every record of the page had already arrived
+                self.response, self.start = reopened
+                self.offset = self.count
+                self.meta = {}
+
+    def _records(self):
+        response = self.response
+        if not hasattr(response, 'iter_content'):
+            # Cached and stub responses are already decoded
+            self.meta = response.json()
+            yield from self.meta.get('results', [])
+            self._finish(getattr(response, 'status_code', 200))
+            return
+
+        decode_start = time.perf_counter()
+        yield from iter_results(iter_text(self._counted(response.iter_content(CHUNK_SIZE))), self.meta)
+        METRICS.observe('page_stream_seconds', time.perf_counter() - decode_start, endpoint='boamp_records')
+        self._finish(response.status_code)
+
+    def _finish(self, status):
+        """Time the current request to the end of its body and release the connection"""
+        if self.start is not None:
+            METRICS.observe('http_request_seconds', time.perf_counter() - self.start,
+                            endpoint='boamp_records', status=status)
+            self.start = None
+        close = getattr(self.response, 'close', None)
+        if close:
+            close()
+
+    def _counted(self, chunks):
+        received = 0
+        for chunk in chunks:
+            received += len(chunk)
+            yield chunk
+        METRICS.inc('http_bytes', received, endpoint='boamp_records', encoding='decoded')
+        METRICS.inc('http_bytes', int(self.response.headers.get('Content-Length') or received),
+                    endpoint='boamp_records', encoding='wire')
+
+
+def stream_page(session, url=BASE_URL, limit=100, before=None, after=None,
+                ascending=False, where=VALID_HTML_WHERE, published_after=None, select=FETCH_FIELDS,
+                published_before=None, since=None):
+    """Request one page of records ordered by idweb using keyset pagination
+
+    Instead of `offset`, each page asks for `idweb < before` (or, walking
+    upwards with ascending=True, `idweb > after`), where the bound is the last
+    idweb of the previous page. Cost per page is constant at any depth, the
+    API's offset ceiling never applies and notices published mid-run cannot
+    shift page boundaries.
+
+    Only `select` columns are requested, and the HTML validity filter and
+    the `published_after`/`published_before` window are applied by the API. Should the API
+    reject those optional filters, the page is re-requested with BASE_WHERE
+    and the filters stay off for the rest of the process (callers keep their
+    own client-side checks).
+
+    With `since` (a checkpoint_key(), see keyset_where) the walk goes
+    upwards in publication order instead, by dateparution then idweb, and
+    the page's cursor is the checkpoint_key() of its last record. That
+    window is the pagination itself, so it is kept should the optional
+    filters be rejected.
+
+    Returns a Page to iterate; HTTP errors are raised here, before any record.
+    """
+    if since is not None:
+        order_by = f'{DATE_FIELD} ASC, idweb ASC'
+    else:
+        order_by = 'idweb ASC' if ascending else 'idweb DESC'
+
+    def request(before, after, limit, since):
+        optional = where != BASE_WHERE or published_after is not None or published_before is not None
+        if optional and not _server_filters['enabled']:
+            filters, optional = (BASE_WHERE, None, None), False
+        else:
+            filters = (where, published_after, published_before)
+
+        params = {
+            'limit': limit,
+            'order_by': order_by,
+            'where': keyset_where(before, after, *filters, since=since)
+        }
+        if select:
+            params['select'] = ','.join(select)
+
+        response, start = _get(session, url, params)
+        if response.status_code == 400 and optional:
+            logger.warning(f"API rejected the server-side filters ({params['where']}) - filtering on the client")
+            _server_filters['enabled'] = False
+            params['where'] = keyset_where(before, after, BASE_WHERE, since=since)
+            response, start = _get(session, url, params)
+        response.raise_for_status()
+        return response, start
+
+    def reopen(last, received):
+        # The rest of the page: below (or above) the last record handed out
+        if received >= limit:
+            return None
+        if not received:
+            return request(before, after, limit, since)
+        if since is not None:
+            return request(before, after, limit - received, last)
+        if ascending:
+            return request(before, last, limit - received, None)
+        return request(last, after, limit - received, None)
+
+    response, start = request(before, after, limit, since)
+    return Page(response, start, reopen, by_date=since is not None)
+
+
+def fetch_page(session, url=BASE_URL, limit=100, before=None, after=None,
+               ascending=False, where=VALID_HTML_WHERE, published_after=None, select=FETCH_FIELDS,
+               published_before=None, since=None):
+    """stream_page() collected into (results, total_count, cursor)
+
+    results are the page's records, total_count the number of records still
+    matching the window; cursor is the idweb to pass as the next `before`
+    (or `after` when ascending, `since` when walking by date), or None when
+    this was the last page.
+    """
+    page = stream_page(session, url, limit, before, after, ascending, where, published_after, select,
+                       published_before, since)
+    results = list(page)
+    return results, page.total_count, page.cursor
+
+
+def download_export(session, path, where=VALID_HTML_WHERE, select=FETCH_FIELDS, resume=True,
+                    max_retries=MAX_RETRIES):
+    """Download the boamp-html dataset export to `path` (.json or .jsonl)
+
+    The body is streamed to `path`.part and renamed when complete, so an
+    existing `path` is a finished download and is returned as is. With
+    resume, a leftover .part file, or a connection dropped mid-download, is
+    continued with an HTTP Range request; the range is asked for without
+    gzip so offsets match the bytes on disk. A server that ignores the range
+    (200 instead of 206) restarts the file from scratch.
+
+    As in stream_page, should the API reject the optional HTML filter the
+    export is requested with BASE_WHERE, from scratch, and the filters stay
+    off for the process; readers filter on MIN_HTML_LENGTH themselves.
+    """
+    if os.path.exists(path):
+        logger.info(f"Export {path} already downloaded")
+        return path
+    if path.endswith('.gz'):
+        raise ValueError(f"Export downloads are stored uncompressed, got {path}")
+
+    url = EXPORT_URL.format(fmt=export_format(path))
+    params = {'select': ','.join(select), 'where': where if _server_filters['enabled'] else BASE_WHERE}
+    part = path + '.part'
+    if not resume and os.path.exists(part):
+        os.remove(part)
+
+    for attempt in range(max_retries + 1):
+        offset = os.path.getsize(part) if os.path.exists(part) else 0
+        headers = {'Range': f'bytes={offset}-', 'Accept-Encoding': 'identity'} if offset else {}
+        start = time.perf_counter()
+        try:
+            response = session.get(url, params=params, headers=headers, timeout=60, stream=True)
+            if response.status_code == 400 and params['where'] != BASE_WHERE:
+                logger.warning(f"API rejected the export filter ({params['where']}) - filtering on the client")
+                _server_filters['enabled'] = False
+                params['where'] = BASE_WHERE
+                response.close()
+                # A partial file of the filtered export cannot be continued unfiltered
+                if offset:
+                    os.remove(part)
+                    offset, headers = 0, {}
+                response = session.get(url, params=params, headers=headers, timeout=60, stream=True)
+            response.raise_for_status()
+            if offset and response.status_code != 206:
+                logger.warning(f"Export server ignored the resume range; restarting {path}")
+                offset = 0
+            elif offset:
+                logger.info(f"Resuming export download at {offset} bytes")
+            received = 0
+            with open(part, 'ab' if offset else 'wb') as f:
+                for chunk in response.iter_content(CHUNK_SIZE):
+                    f.write(chunk)
+                    received += len(chunk)
+            METRICS.inc('http_bytes', received, endpoint='boamp_export', encoding='decoded')
+            METRICS.observe('http_request_seconds', time.perf_counter() - start,
+                            endpoint='boamp_export', status=str(response.status_code))
+            break
+        except (requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+                requests.exceptions.ChunkedEncodingError) as e:
+            if not resume or attempt == max_retries:
+                raise
+            delay = backoff_delay(attempt)
+            logger.warning(f"Export download interrupted ({e.__class__.__name__}), resuming in {delay:.1f}s")
+            METRICS.inc('http_retries', reason='export')
+            time.sleep(delay)
+
+    os.replace(part, path)
+    logger.info(f"Downloaded export to {path} ({os.path.getsize(path)} bytes)")
+    return path
@@ -0,0 +1,227 @@
+import hashlib
+import json
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from boamp_fields import parse_amount
+from boamp_http import backoff_delay, retry_after
+from boamp_metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+ANTHROPIC_API_URL = "https://api.anthropic.com/v1/messages"
+AWARD_MODEL = "claude-3-haiku-20240307"
+DEFAULT_CONCURRENCY = 4
+MAX_RETRIES = 5
+RETRY_STATUSES = {429, 500, 502, 503, 529}
+
+
+def award_text(tree):
+    """The part of a notice sent to the model: 3000 characters from 'Section 4' on"""
+    text_content = tree.text(separator='\n', strip=True)
+
+    if 'Section 4' in text_content:
+        start_idx = text_content.find('Section 4')
+        return text_content[start_idx:start_idx+3000]
+    return text_content[:3000]
+
+
+def award_key(text):
+    """Cache key of an extraction: SHA-256 of the model and the section-4 text"""
+    return hashlib.sha256(f"{AWARD_MODEL}\n{text}".encode('utf-8')).hexdigest()
+
+
+def award_amount(value):
+    """award_value from the model as a float: numbers as is, strings like "1 200 000 €" parsed; else None"""
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    return parse_amount(value) if isinstance(value, str) else None
+
+
+def normalize_award(award_data):
+    """Check a model answer before it is used or cached; ValueError if unusable"""
+    value = award_data.get('award_value')
+    if value not in (None, ''):
+        amount = award_amount(value)
+        if amount is None:
+            raise ValueError(f"unparseable award_value {value!r}")
+        award_data['award_value'] = amount
+    return award_data
+
+
+def award_prompt(relevant_text):
+    # FIX: Updated prompt with buyer/winner distinction
+    return f"""Extract structured data from this French award notice. Return ONLY valid JSON, no other text.
+
+CRITICAL: Distinguish between BUYER and WINNER:
+- BUYER (Acheteur): Government entity awarding the contract (Mairie, Commune, Ville, Region, Departement, Prefecture, Ministere, Conseil, Hopital, Universite, Lycee, College, Syndicat, SDIS, etc.)
+- WINNER (Titulaire/Attributaire): Private COMPANY that won the contract (SARL, SAS, SA, EURL, commercial businesses)
+
+If you see "Mairie de X", "Commune de X", "Ville de X" - that is the BUYER, NOT the winner!
+
+Required fields (use null if not found):
+- winner_name: Company name that won (NOT a government entity)
+- winner_address: Street address
+- winner_city: City
+- winner_postal_code: 5-digit code
+- winner_country: Country (default "France")
+- award_value: Numeric euros
+- award_date: YYYY-MM-DD
+- contract_number: Contract number
+
+VALIDATION: If winner_name contains Mairie, Commune, Ville, Region, Departement, Prefecture, Ministere, Conseil, Hopital, Universite, you made an error - that's the buyer!
+
+AWARD NOTICE:
+{relevant_text}
+
+JSON only:"""
+
+
+class AwardExtractor:
+    """LLM award extraction with bounded concurrency, rate-limit backoff and a result cache
+
+    extract_many() runs up to `concurrency` requests at once. A 429 (or
+    5xx/529) response pauses every worker until its Retry-After has passed,
+    falling back to jittered exponential backoff, so the rate limit is
+    respected as a whole rather than per thread. A dropped connection or a
+    timeout is retried with the same backoff, by that request alone. Successful extractions are
+    cached under award_key() of the text sent, so a re-run never pays twice
+    for the same notice; `cache` is anything with get(key) / put(key, obj),
+    such as a boamp_cache.ResponseCache. Answers that fail normalize_award()
+    count as failures and are never cached; the reason is kept in
+    `errors[notice_id]` for the caller.
+
+    `api_url` points at the Messages API; tests can aim it at a local stand-in.
+    """
+
+    def __init__(self, api_key, api_url=ANTHROPIC_API_URL, concurrency=DEFAULT_CONCURRENCY, cache=None,
+                 max_retries=MAX_RETRIES, timeout=30):
+        self.api_key = api_key
+        self.api_url = api_url
+        self.concurrency = max(1, concurrency)
+        self.cache = cache
+        self.max_retries = max_retries
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._lock = threading.Lock()
+        self._resume_at = 0.0
+        self.stats = {'requests': 0, 'cached': 0, 'retries': 0, 'failed': 0}
+        self.errors = {}
+
+    def extract(self, text, notice_id=None):
+        """Award fields for one notice's award_text(), None when extraction fails"""
+        key = award_key(text)
+        if self.cache is not None:
+            with self._lock:
+                cached = self.cache.get(key)
+            if cached is not None:
+                try:
+                    award_data = normalize_award(dict(cached))
+                except ValueError:
+                    pass    # cached before answers were checked; ask again
+                else:
+                    self._count('cached')
+                    return award_data
+
+        try:
+            award_data = normalize_award(self._call(award_prompt(text)))
+        except Exception as e:
+            logger.warning(f"Claude extraction failed for {notice_id}: {e}")
+            self._count('failed')
+            with self._lock:
+                self.errors[notice_id] = str(e)[:500]
+            return None
+
+        if self.cache is not None:
+            with self._lock:
+                self.cache.put(key, award_data)
+        return dict(award_data)
+
+    def extract_many(self, items):
+        """Extract [(notice_id, text), ...] concurrently; results in input order"""
+        if not items:
+            return []
+        if len(items) == 1 or self.concurrency == 1:
+            return [self.extract(text, notice_id) for notice_id, text in items]
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(items))) as executor:
+            return list(executor.map(lambda item: self.extract(item[1], item[0]), items))
+
+    def _count(self, stat):
+        with self._lock:
+            self.stats[stat] += 1
+
+    def _wait_for_slot(self):
+        while True:
+            with self._lock:
+                delay = self._resume_at - time.monotonic()
+            if delay <= 0:
+                return
+            time.sleep(delay)
+
+    def _back_off(self, seconds):
+        with self._lock:
+            self._resume_at = max(self._resume_at, time.monotonic() + seconds)
+
+    def _call(self, prompt):
+        for attempt in range(self.max_retries + 1):
+            self._wait_for_slot()
+            self._count('requests')
+            start = time.perf_counter()
+            try:
+                response = self.session.post(
+                    self.api_url,
+                    headers={
+                        "x-api-key": self.api_key,
+                        "anthropic-version": "2023-06-01",
+                        "content-type": "application/json"
+                    },
+                    json={
+                        "model": AWARD_MODEL,
+                        "max_tokens": 1024,
+                        "messages": [{"role": "user", "content": prompt}]
+                    },
+                    timeout=self.timeout
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                METRICS.observe('http_request_seconds', time.perf_counter() - start, endpoint='anthropic',
+                                status='error')
+                if attempt == self.max_retries:
+                    raise
+                # Only this request failed; the others carry on while it waits
+                delay = backoff_delay(attempt)
+                logger.warning(f"Award API request failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                self._count('retries')
+                time.sleep(delay)
+                continue
+            METRICS.observe('http_request_seconds', time.perf_counter() - start, endpoint='anthropic',
+                            status=response.status_code)
+
+            if response.status_code in RETRY_STATUSES and attempt < self.max_retries:
+                delay = retry_after(response)
+                if delay is None:
+                    delay = backoff_delay(attempt)
+                logger.warning(f"Award API returned {response.status_code}, retrying in {delay:.1f}s")
+                self._count('retries')
+                self._back_off(delay)
+                continue
+
+            response.raise_for_status()
+            content = response.json()['content'][0]['text'].strip()
+            content = re.sub(r'```json\n?|\n?```', '', content)
+            award_data = json.loads(content)
+            if not isinstance(award_data, dict):
+                raise ValueError(f"expected a JSON object, got {type(award_data).__name__}")
+            return award_data
@@ -0,0 +1,310 @@
+import argparse
+import glob
+import gzip
+import hashlib
+import json
+import logging
+import os
+import platform
+import resource
+import sys
+import time
+from datetime import datetime
+
+from boamp_api import FETCH_FIELDS, MIN_HTML_LENGTH
+from boamp_stream import CHUNK_SIZE, iter_results, iter_text
+from boamp_tree import LabelIndex, NoticeTree
+from boamp_daily_scraper import COMPREHENSIVE_EXTRACTOR, PARSER_VERSION, BOAMPNoticeParser
+
+# Frozen notices checked in next to this file: avis de marché, résultat and
+# attribution (plain-text and eForms), rectificatif and multi-lot
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_corpus')
+
+# HTML of incomplete records, which the server-side filter keeps off the page
+INCOMPLETE_HTML = (None, '', '<div class="avis"><p>Avis en cours de publication</p></div>')
+
+
+def load_corpus(corpus_dir=CORPUS_DIR):
+    """[(file name, html)] for every notice in the corpus, in name order"""
+    corpus = []
+    for path in sorted(glob.glob(os.path.join(corpus_dir, '*.html'))):
+        with open(path, encoding='utf-8') as f:
+            corpus.append((os.path.basename(path), f.read()))
+    return corpus
+
+
+def corpus_digest(corpus):
+    """SHA-256 over the corpus, so results are only compared on the same notices"""
+    digest = hashlib.sha256()
+    for name, html in corpus:
+        digest.update(name.encode('utf-8'))
+        digest.update(html.encode('utf-8'))
+    return digest.hexdigest()
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(samples):
+    """Count, mean, p50 and p99 (in milliseconds) of per-notice timings in seconds"""
+    samples = sorted(samples)
+    return {
+        'count': len(samples),
+        'mean_ms': sum(samples) / len(samples) * 1000 if samples else 0.0,
+        'p50_ms': percentile(samples, 0.50) * 1000,
+        'p99_ms': percentile(samples, 0.99) * 1000,
+    }
+
+
+def peak_rss_kib():
+    """Peak resident set size of this process (ru_maxrss is bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak // 1024 if sys.platform == 'darwin' else peak
+
+
+def time_stages(html, samples):
+    """Time one notice stage by stage: tree, label index, prefetch, then every field
+
+    Mirrors FieldExtractor.extract(); fields run after prefetch, so their
+    figures are the work left once label lookups are resolved.
+    """
+    start = time.perf_counter()
+    tree = NoticeTree(html)
+    samples['tree'].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    index = LabelIndex(tree)
+    samples['label_index'].append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for section, patterns in COMPREHENSIVE_EXTRACTOR.sections.items():
+        index.prefetch(patterns, section)
+    samples['prefetch'].append(time.perf_counter() - start)
+
+    data = {}
+    for field in COMPREHENSIVE_EXTRACTOR.fields:
+        start = time.perf_counter()
+        data[field.name] = field.extract(tree, index, data)
+        samples[f'field:{field.name}'].append(time.perf_counter() - start)
+
+
+def unprojected_page(corpus):
+    """The corpus as an API page without `select` or the HTML filter
+
+    Each record has every column. Besides FETCH_FIELDS, the notice's fields
+    as parsed from its HTML stand in for the dataset's metadata columns.
+    Records with missing, empty or short HTML are added, as the API returns
+    them when not filtered. Pass a saved real page to payload_stats() for
+    exact figures.
+    """
+    records = []
+    for name, html in corpus:
+        fields = COMPREHENSIVE_EXTRACTOR.extract(html)
+        published = fields.get('published_at')
+        records.append(dict(fields, idweb=name[:-5], html=html,
+                            dateparution=f"{published:%Y-%m-%d}" if published else None))
+    for i, html in enumerate(INCOMPLETE_HTML):
+        records.append(dict(records[0], idweb=f"{records[0]['idweb']}-incomplete-{i}", html=html))
+    return records
+
+
+def projected(records):
+    """What the API sends for the same records with select=FETCH_FIELDS and the HTML filter"""
+    return [{field: r.get(field) for field in FETCH_FIELDS}
+            for r in records if r.get('html') and len(r['html']) > MIN_HTML_LENGTH]
+
+
+def payload_stats(corpus, rounds=50, full=None):
+    """Bytes and decode time of an API page, without and with projection and filtering
+
+    `full` is a page of records as sent without select or where
+    (unprojected_page(corpus) by default). The top-level figures are for the
+    same page as requested with select=FETCH_FIELDS and the HTML filter;
+    'full' holds those of the full page.
+    """
+    full = unprojected_page(corpus) if full is None else full
+    stats = page_stats(projected(full), rounds)
+    stats['fields'] = list(FETCH_FIELDS)
+    stats['full'] = page_stats(full, rounds)
+    return stats
+
+
+def page_stats(page, rounds=50):
+    """Size and decode time of one API page of records
+
+    Reports the JSON body as decoded and as sent gzip-compressed, per page
+    and per record, and the p50/p99 of json.loads() over the page next to
+    the streaming decoder fed CHUNK_SIZE byte chunks.
+    """
+    body = json.dumps({'total_count': len(page), 'results': page}, default=str).encode('utf-8')
+    compressed = gzip.compress(body)
+
+    samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        json.loads(body)
+        samples.append(time.perf_counter() - start)
+
+    chunks = [body[i:i + CHUNK_SIZE] for i in range(0, len(body), CHUNK_SIZE)]
+    stream_samples = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _record in iter_results(iter_text(chunks)):
+            pass
+        stream_samples.append(time.perf_counter() - start)
+
+    return {
+        'records': len(page),
+        'page_bytes': len(body),
+        'page_gzip_bytes': len(compressed),
+        'bytes_per_notice': len(body) / len(page) if page else 0.0,
+        'gzip_bytes_per_notice': len(compressed) / len(page) if page else 0.0,
+        'json_decode': summarize(samples),
+        'stream_decode': summarize(stream_samples),
+    }
+
+
+def run_benchmark(corpus, rounds=50, warmup=2, full_page=None):
+    """Benchmark parse_tender and each extraction stage over the corpus
+
+    Returns a JSON-serializable dict: throughput and latency of the whole
+    parse_tender, p50/p99 per stage and field extractor, the API page
+    payload (see payload_stats; `full_page` replaces the stand-in full
+    page), and peak RSS.
+    """
+    parser = BOAMPNoticeParser()
+    records = [{'idweb': name[:-5], 'html': html} for name, html in corpus]
+
+    for _ in range(warmup):
+        for record in records:
+            parser.parse_tender(record)
+
+    totals = []
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for record in records:
+            start = time.perf_counter()
+            parser.parse_tender(record)
+            totals.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - started
+
+    stage_samples = {name: [] for name in ('tree', 'label_index', 'prefetch')}
+    stage_samples.update((f'field:{field.name}', []) for field in COMPREHENSIVE_EXTRACTOR.fields)
+    award_samples = []
+    for _ in range(rounds):
+        for _, html in corpus:
+            time_stages(html, stage_samples)
+            tree = NoticeTree(html)
+            start = time.perf_counter()
+            parser.extract_resultat_section4(tree)
+            award_samples.append(time.perf_counter() - start)
+    stage_samples['award_section4'] = award_samples
+
+    per_notice = {}
+    for name, html in corpus:
+        samples = []
+        record = {'idweb': name[:-5], 'html': html}
+        for _ in range(rounds):
+            start = time.perf_counter()
+            parser.parse_tender(record)
+            samples.append(time.perf_counter() - start)
+        per_notice[name] = dict(summarize(samples), bytes=len(html.encode('utf-8')))
+
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'parser_version': PARSER_VERSION,
+        'corpus': {'notices': len(corpus), 'sha256': corpus_digest(corpus)},
+        'rounds': rounds,
+        'parse_tender': dict(summarize(totals), notices_per_second=len(totals) / elapsed),
+        'stages': {name: summarize(samples) for name, samples in stage_samples.items()},
+        'notices': per_notice,
+        'payload': payload_stats(corpus, rounds, full_page),
+        'peak_rss_kib': peak_rss_kib(),
+    }
+
+
+def compare(results, baseline):
+    """Lines showing p50/p99 changes against a baseline result file"""
+    lines = []
+    if results['corpus']['sha256'] != baseline['corpus']['sha256']:
+        lines.append("warning: baseline was run on a different corpus")
+    before, after = baseline['parse_tender'], results['parse_tender']
+    lines.append(f"parse_tender: {before['notices_per_second']:.0f} -> {after['notices_per_second']:.0f} notices/s")
+    if 'payload' in baseline and 'payload' in results:
+        before, after = baseline['payload'], results['payload']
+        lines.append(f"API page: {before['page_gzip_bytes']} -> {after['page_gzip_bytes']} gzipped bytes, "
+                     f"json decode p50 {before['json_decode']['p50_ms']:.3f} -> "
+                     f"{after['json_decode']['p50_ms']:.3f} ms")
+    for name, stats in results['stages'].items():
+        old = baseline['stages'].get(name)
+        if old and old['p50_ms']:
+            change = (stats['p50_ms'] - old['p50_ms']) / old['p50_ms'] * 100
+            lines.append(f"{name:<36} p50 {old['p50_ms']:8.3f} -> {stats['p50_ms']:8.3f} ms ({change:+.0f}%)")
+    return lines
+
+
+def report(results):
+    """Human-readable summary of a run_benchmark() result"""
+    total = results['parse_tender']
+    lines = [
+        f"{results['corpus']['notices']} notices x {results['rounds']} rounds, parser v{results['parser_version']}",
+        f"parse_tender: {total['notices_per_second']:.0f} notices/s, "
+        f"p50 {total['p50_ms']:.3f} ms, p99 {total['p99_ms']:.3f} ms",
+        f"peak RSS: {results['peak_rss_kib'] / 1024:.1f} MiB",
+    ]
+    payload = results.get('payload')
+    if payload:
+        pages = [('full records', payload['full'])] if 'full' in payload else []
+        pages.append((f"select {','.join(payload['fields'])} + html filter", payload))
+        for label, page in pages:
+            lines.append(
+                f"API page, {label}: {page.get('records', '?')} records, {page['page_bytes']} bytes, "
+                f"{page['page_gzip_bytes']} gzipped ({page['gzip_bytes_per_notice']:.0f}/record), "
+                f"json decode p50 {page['json_decode']['p50_ms']:.3f} ms, "
+                f"streamed {page['stream_decode']['p50_ms']:.3f} ms")
+    lines += [
+        "",
+        f"{'stage':<36} {'p50 ms':>9} {'p99 ms':>9}",
+    ]
+    for name, stats in sorted(results['stages'].items(), key=lambda item: -item[1]['p99_ms']):
+        lines.append(f"{name:<36} {stats['p50_ms']:9.3f} {stats['p99_ms']:9.3f}")
+    lines.append("")
+    for name, stats in results['notices'].items():
+        lines.append(f"{name:<36} {stats['p50_ms']:9.3f} {stats['p99_ms']:9.3f}  ({stats['bytes']} bytes)")
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the BOAMP notice parser on the frozen corpus")
+    parser.add_argument('--corpus', default=CORPUS_DIR, help="directory of *.html notices")
+    parser.add_argument('--rounds', type=int, default=50, help="passes over the corpus per measurement")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--compare', help="JSON results of an earlier run to compare against")
+    parser.add_argument('--full-page', help="a saved API page fetched without select/where, for the payload figures")
+    args = parser.parse_args()
+
+    full = None
+    if args.full_page:
+        with open(args.full_page) as f:
+            full = json.load(f)['results']
+
+    logging.disable(logging.CRITICAL)
+    results = run_benchmark(load_corpus(args.corpus), rounds=args.rounds, full_page=full)
+    print(report(results))
+
+    if args.compare:
+        with open(args.compare) as f:
+            print()
+            print('\n'.join(compare(results, json.load(f))))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults written to {args.output}")
@@ -0,0 +1,300 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+import zlib
+from urllib.parse import urlencode
+
+from boamp_stream import CHUNK_SIZE, iter_results, iter_text
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = '.boamp_cache'
+SEGMENT_SIZE = 64 * 1024 * 1024
+
+
+def request_key(url, params):
+    """Content address of an API request: hash of the URL and sorted params"""
+    canonical = url + '?' + urlencode(sorted((params or {}).items()))
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+
+class ResponseCache:
+    """Content-addressed on-disk cache of raw API pages and notice HTML.
+
+    Objects are appended as individual gzip members to JSONL segment files
+    (segments/NNNNNN.jsonl.gz, rolled at SEGMENT_SIZE) and located through
+    index.jsonl, which maps each key to (segment, offset, length). Pages are
+    keyed by request_key(). A streamed page is stored as its raw body, written
+    while it is being read (record_page). A page handed over already decoded
+    (put_page) has its HTML replaced by a reference to the notice object,
+    keyed by the SHA-256 of the HTML, so that notice is stored once.
+
+    Each recording run also appends the location of every page it stored,
+    in request order, to runs/<run_id>.jsonl. A replay walks that list, so
+    it sees exactly the recorded pages even when its own request parameters
+    differ, and later re-recordings of the same request do not change it.
+    """
+
+    def __init__(self, root=DEFAULT_CACHE_DIR):
+        self.root = root
+        self.segment_dir = os.path.join(root, 'segments')
+        self.index_path = os.path.join(root, 'index.jsonl')
+        self.run_dir = os.path.join(root, 'runs')
+        self.run_id = None    # set by start_run() while recording
+        os.makedirs(self.segment_dir, exist_ok=True)
+
+        self.index = {}
+        if os.path.exists(self.index_path):
+            with open(self.index_path, encoding='utf-8') as f:
+                for line in f:
+                    entry = json.loads(line)
+                    self.index[entry['key']] = (entry['segment'], entry['offset'], entry['length'])
+
+        segments = sorted(os.listdir(self.segment_dir))
+        self.segment = int(segments[-1].split('.')[0]) if segments else 0
+
+    def _segment_path(self, segment):
+        return os.path.join(self.segment_dir, f"{segment:06d}.jsonl.gz")
+
+    def _current_segment(self):
+        """Path of the segment to append to, rolling over once it reaches SEGMENT_SIZE"""
+        path = self._segment_path(self.segment)
+        if os.path.exists(path) and os.path.getsize(path) >= SEGMENT_SIZE:
+            self.segment += 1
+            path = self._segment_path(self.segment)
+        return path
+
+    def _index(self, key, segment, offset, length):
+        with open(self.index_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'key': key, 'segment': segment, 'offset': offset, 'length': length}) + '\n')
+        self.index[key] = (segment, offset, length)
+        return self.index[key]
+
+    def _write(self, key, obj, replace=False):
+        """Append obj under key (unless already there); its (segment, offset, length)"""
+        if key in self.index and not replace:
+            return self.index[key]
+        path = self._current_segment()
+        member = gzip.compress((json.dumps(obj, ensure_ascii=False) + '\n').encode('utf-8'))
+        with open(path, 'ab') as f:
+            offset = f.tell()
+            f.write(member)
+        return self._index(key, self.segment, offset, len(member))
+
+    def _log_page(self, key, location):
+        if self.run_id is not None:
+            os.makedirs(self.run_dir, exist_ok=True)
+            with open(os.path.join(self.run_dir, f"{self.run_id}.jsonl"), 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'key': key, 'location': location}) + '\n')
+
+    def _read(self, key):
+        location = self.index.get(key)
+        if location is None:
+            return None
+        return self._read_at(location)
+
+    def _read_at(self, location):
+        segment, offset, length = location
+        with open(self._segment_path(segment), 'rb') as f:
+            f.seek(offset)
+            return json.loads(gzip.decompress(f.read(length)))
+
+    def get(self, key):
+        """Any other cached object (e.g. an award extraction), or None"""
+        return self._read(key)
+
+    def put(self, key, obj):
+        self._write(key, obj, replace=True)
+
+    def put_page(self, url, params, data):
+        """Store one raw API response; notice HTML is split out and deduplicated"""
+        records = []
+        for record in data.get('results', []):
+            record = dict(record)
+            html = record.pop('html', None)
+            if html is not None:
+                html_key = hashlib.sha256(html.encode('utf-8')).hexdigest()
+                self._write(html_key, {'html': html})
+                record['html_ref'] = html_key
+            records.append(record)
+        # A re-recorded request supersedes the old page (later index lines win)
+        page = {'total_count': data.get('total_count', 0), 'results': records}
+        key = request_key(url, params)
+        self._log_page(key, self._write(key, page, replace=True))
+
+    def record_page(self, url, params, chunks):
+        """Pass a streamed API response body through, storing it as it goes
+
+        Each chunk is compressed into a gzip member of the current segment
+        before it is handed on, so the page is never held in memory. The
+        page is indexed and logged once its last chunk has gone through. If
+        the body stops early (a dropped connection, or a caller that stops
+        reading), the raw member is dropped. The records that had fully
+        arrived are stored with put_page() instead, so the run log still
+        holds every record the caller was handed. The decoder reads up to a
+        chunk ahead, so a replay may see the few records re-requested after
+        the interruption twice.
+        """
+        path = self._current_segment()
+        segment = self.segment
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)    # wbits 31: a gzip member
+        complete = False
+        f = open(path, 'ab')
+        offset = f.tell()
+        try:
+            for chunk in chunks:
+                f.write(compressor.compress(chunk))
+                yield chunk
+            f.write(compressor.flush())
+            complete = True
+        finally:
+            if complete:
+                length = f.tell() - offset
+                f.close()
+                key = request_key(url, params)
+                self._log_page(key, self._index(key, segment, offset, length))
+            else:
+                f.write(compressor.flush())
+                f.flush()
+                meta, records = self._complete_records(path, offset)
+                f.truncate(offset)
+                f.close()
+                logger.info(f"Recorded {len(records)} records of an interrupted page")
+                self.put_page(url, params, dict(meta, results=records))
+
+    def _complete_records(self, path, offset):
+        """(meta, records) of the truncated page body appended to path at offset"""
+        def text():
+            decompressor = zlib.decompressobj(31)
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    yield decompressor.decompress(chunk)
+
+        meta, records = {}, []
+        try:
+            for record in iter_results(iter_text(text()), meta):
+                records.append(record)
+        except ValueError:
+            pass    # the record cut off by the interruption
+        return meta, records
+
+    def start_run(self):
+        """Log the pages stored from now on as a new run; returns its id"""
+        self.run_id = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}"
+        return self.run_id
+
+    def runs(self):
+        """Ids of the recorded runs, oldest first"""
+        if not os.path.isdir(self.run_dir):
+            return []
+        return sorted(name[:-len('.jsonl')] for name in os.listdir(self.run_dir) if name.endswith('.jsonl'))
+
+    def run_pages(self, run_id):
+        """[(request key, location), ...] of a recorded run, in request order"""
+        with open(os.path.join(self.run_dir, f"{run_id}.jsonl"), encoding='utf-8') as f:
+            return [(entry['key'], tuple(entry['location'])) for entry in map(json.loads, f)]
+
+    def get_page(self, url, params):
+        """Rebuild a cached API response, or None if this request was never recorded"""
+        page = self._read(request_key(url, params))
+        if page is None:
+            return None
+        return self._rebuild(page)
+
+    def get_page_at(self, location):
+        """Rebuild the page stored at a run log location"""
+        return self._rebuild(self._read_at(location))
+
+    def _rebuild(self, page):
+        for record in page['results']:
+            html_key = record.pop('html_ref', None)
+            if html_key is not None:
+                record['html'] = self._read(html_key)['html']
+        return page
+
+
+class CachedResponse:
+    """The slice of requests.Response the fetchers use, served from the cache"""
+
+    status_code = 200
+
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+class RecordingResponse:
+    """A streamed requests.Response whose body goes into the cache as it is read"""
+
+    def __init__(self, response, cache, url, params):
+        self.response = response
+        self.cache = cache
+        self.url = url
+        self.params = params
+        self.status_code = response.status_code
+        self.headers = response.headers
+
+    def raise_for_status(self):
+        self.response.raise_for_status()
+
+    def iter_content(self, chunk_size=CHUNK_SIZE):
+        return self.cache.record_page(self.url, self.params, self.response.iter_content(chunk_size))
+
+    def close(self):
+        self.response.close()
+
+
+class CachingSession:
+    """Wraps a requests.Session: records every API page, or replays them offline
+
+    Recording logs the run's pages in order (ResponseCache.start_run). In
+    replay mode no network call is made: each request is answered with the
+    next page of the recorded run (`run`, the latest one by default),
+    whatever its parameters, so a replay sees the same input as the run it
+    replays even though it walks without the live checkpoint. Once the
+    recorded pages are used up an empty page ends the run like the end of data.
+
+    While recording, responses are returned still streaming: the caller
+    decodes the body (boamp_stream.iter_results) while it is copied into
+    the cache, so a page is never decoded twice or held whole in memory.
+    """
+
+    def __init__(self, session, cache, replay=False, run=None):
+        self.session = session
+        self.cache = cache
+        self.replay = replay
+        if replay:
+            runs = cache.runs()
+            run = run or (runs[-1] if runs else None)
+            if run is None or run not in runs:
+                raise ValueError(f"No recorded run {run or ''} in {cache.root} to replay")
+            self.pages = iter(cache.run_pages(run))
+            logger.info(f"Replaying recorded run {run}")
+        else:
+            cache.start_run()
+
+    def get(self, url, params=None, **kwargs):
+        if self.replay:
+            recorded = next(self.pages, None)
+            if recorded is None:
+                logger.info("Recorded run exhausted")
+                return CachedResponse({'results': [], 'total_count': 0})
+            key, location = recorded
+            if key != request_key(url, params):
+                logger.debug(f"Replay request {params} differs from the recorded one; serving the recorded page")
+            return CachedResponse(self.cache.get_page_at(location))
+
+        response = self.session.get(url, params=params, **kwargs)
+        if not response.ok:
+            # Left to the caller (fetch_page may retry without optional filters)
+            return response
+        return RecordingResponse(response, self.cache, url, params)
@@ -1,14 +1,30 @@
 import requests
 import os
-from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
+from datetime import date, datetime, timedelta
 import warnings
 import psycopg2
 from psycopg2.extras import execute_values
 import time
 import re
 import logging
-import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import asyncio
+from functools import partial
+from operator import attrgetter
+from contextlib import nullcontext
+from boamp_api import (BASE_URL, DATE_FIELD, MIN_HTML_LENGTH, checkpoint_key, download_export, newest_checkpoint,
+                       server_filters_enabled, stream_page)
+from boamp_html_store import HtmlStore, content_hash
+from boamp_cache import DEFAULT_CACHE_DIR, CachingSession, ResponseCache
+from boamp_http import DEFAULT_RATE, HttpClient
+from boamp_tree import LabelIndex, NoticeTree
+from boamp_fields import FieldExtractor, parse_amount, parse_date
+from boamp_awards import ANTHROPIC_API_URL, DEFAULT_CONCURRENCY, AwardExtractor, award_amount, award_text
+from boamp_entities import government_entities, is_government_entity
+from boamp_metrics import METRICS, profiled
+from boamp_stream import batched, iter_export
+from boamp_leases import DEFAULT_CHUNK_DAYS, DEFAULT_LEASE_SECONDS, ChunkLeases, default_worker_id
+import argparse
 
 warnings.filterwarnings("ignore")
 
@@ -18,52 +34,488 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# =============================================================================
-# FIX: Government entity detection to prevent buyer/winner confusion
-# =============================================================================
-GOVERNMENT_KEYWORDS = [
-    'mairie', 'commune', 'ville', 'region', 'departement', 'prefecture',
-    'ministere', 'conseil', 'hopital', 'centre hospitalier', 'universite',
-    'lycee', 'college', 'ecole', 'syndicat', 'office public', 'sdis',
-    'communaute', 'metropole', 'agglomeration', 'etablissement public',
-    'direction regionale', 'direction departementale', 'rectorat',
-    'academie', 'caisse', 'chambre de commerce', 'port autonome'
-]
-
-def is_government_entity(name):
-    """Check if name is a government entity (should be buyer, not winner)"""
-    if not name:
-        return False
-    name_lower = name.lower()
-    for keyword in GOVERNMENT_KEYWORDS:
-        if keyword in name_lower:
-            return True
-    return False
-
-
-class BOAMPComprehensiveScraper:
-    def __init__(self):
-        self.base_url = "https://www.boamp.fr/api/explore/v2.1/catalog/datasets/boamp-html/records"
+
+class BOAMPNoticeParser:
+    """Stateless notice parser: no DB connection or HTTP session, so it pickles
+    cleanly into parse worker processes. The award extractor (and its HTTP
+    session) is only created on first use, in the process that enriches."""
+
+    def __init__(self, anthropic_api_key=None, award_concurrency=DEFAULT_CONCURRENCY, award_cache_dir=None,
+                 award_api_url=ANTHROPIC_API_URL):
+        self.anthropic_api_key = anthropic_api_key
+        self.award_api_url = award_api_url
+        self.use_claude_for_awards = bool(anthropic_api_key)
+        self.award_concurrency = award_concurrency
+        self.award_cache_dir = award_cache_dir or os.path.join(DEFAULT_CACHE_DIR, 'awards')
+        self._award_extractor = None
+
+    def award_extractor(self):
+        if self._award_extractor is None:
+            self._award_extractor = AwardExtractor(
+                self.anthropic_api_key,
+                api_url=self.award_api_url,
+                concurrency=self.award_concurrency,
+                cache=ResponseCache(self.award_cache_dir)
+            )
+        return self._award_extractor
+
+    def extract_resultat_section4(self, tree):
+        """Extract winner info from Section 4 plain text format - WITH FIX"""
+        winner_data = {}
+
+        section_4 = tree.sections.get('section_4')
+        if section_4 is None or section_4.html is None:
+            return winner_data
+
+        section_4_text = section_4.html
+
+        # Extract award date
+        date_match = re.search(r"Date d'attribution\s*:\s*(\d{2}/\d{2}/\d{2})", section_4_text)
+        if date_match:
+            date_str = date_match.group(1)
+            parts = date_str.split('/')
+            date_str = f"{parts[0]}/{parts[1]}/20{parts[2]}"
+            winner_data['award_date'] = self.parse_date(date_str)
+
+        # Extract award value
+        value_match = re.search(r'Montant\s+Ht\s*:\s*([\d\s,]+)', section_4_text, re.IGNORECASE)
+        if value_match:
+            winner_data['award_value'] = self.parse_amount(value_match.group(1))
+
+        if not winner_data.get('award_value'):
+            value_match2 = re.search(r'Montant[^:]*:\s*[^0-9]*?([\d\s]+)\s*EUR', section_4_text, re.IGNORECASE)
+            if value_match2:
+                winner_data['award_value'] = self.parse_amount(value_match2.group(1))
+
+        # Extract winner - Pattern 1: line after "Marche n : XX.XXX"
+        marche_match = re.search(r'March[^\n]*n[^\n]*:\s*[\d\.]+\s*\n\s*([^\n]+)', section_4_text)
+        if marche_match:
+            winner_line = marche_match.group(1).strip()
+            winner_line = re.sub(r'<[^>]+>', '', winner_line)
+
+            parts = [p.strip() for p in winner_line.split(',')]
+
+            # FIX: Check each part - skip government entities
+            for part, is_government in zip(parts, government_entities(parts)):
+                if part and not is_government:
+                    winner_data['winner_name'] = part
+                    break
+
+            if len(parts) >= 2:
+                winner_data['winner_address'] = parts[1]
+
+            if len(parts) >= 3:
+                last_part = parts[-1]
+                postal_match = re.search(r'(\d{5})\s+(.+)', last_part)
+                if postal_match:
+                    winner_data['winner_postal_code'] = postal_match.group(1)
+                    winner_data['winner_city'] = postal_match.group(2).strip()
+
+        # Extract winner - Pattern 2: "Attribution a l'agence NAME"
+        if not winner_data.get('winner_name'):
+            attrib_match = re.search(r'Attribution\s+[^\n]*\s+([^<\n]+)', section_4_text, re.IGNORECASE)
+            if attrib_match:
+                winner_line = attrib_match.group(1).strip()
+                if 'Montant' in winner_line:
+                    winner_line = winner_line.split('Montant')[0].strip()
+
+                parts = [p.strip() for p in winner_line.split(' - ')]
+
+                if len(parts) >= 1:
+                    name = re.sub(r"^(l'agence|la societe|le|la|l')\s+", '', parts[0], flags=re.IGNORECASE)
+                    # FIX: Validate it's not a government entity
+                    if name and not is_government_entity(name):
+                        winner_data['winner_name'] = name
+
+                if len(parts) >= 2:
+                    winner_data['winner_address'] = parts[1]
+
+                if len(parts) >= 3:
+                    last_part = parts[-1]
+                    postal_match = re.search(r'(\d{5})\s+(.+)', last_part)
+                    if postal_match:
+                        winner_data['winner_postal_code'] = postal_match.group(1)
+                        winner_data['winner_city'] = postal_match.group(2).strip().rstrip('-').strip()
+
+        # FIX: Final validation
+        if winner_data.get('winner_name') and is_government_entity(winner_data['winner_name']):
+            logger.warning(f"Rejected govt entity as winner: {winner_data['winner_name']}")
+            winner_data['winner_name'] = None
+
+        return winner_data
+
+    def _validate_claude_award(self, award_data):
+        # FIX: Validate winner is not a government entity
+        if award_data.get('winner_name') and is_government_entity(award_data['winner_name']):
+            logger.warning(f"Claude returned govt as winner: {award_data['winner_name']} - clearing")
+            award_data['winner_name'] = None
+        return award_data
+
+    def _apply_claude_award(self, data, claude_data):
+        if not (claude_data and claude_data.get('winner_name')):
+            return False
+
+        # FIX: Double-check it's not a government entity
+        if is_government_entity(claude_data['winner_name']):
+            logger.warning(f"   Claude returned govt entity: {claude_data['winner_name']} - skipping")
+            return False
+
+        data['winner_name'] = claude_data.get('winner_name')
+        data['winner_city'] = claude_data.get('winner_city')
+        data['winner_postal_code'] = claude_data.get('winner_postal_code')
+        data['winner_country'] = claude_data.get('winner_country') or 'France'
+        data['winner_email'] = claude_data.get('winner_email')
+        data['winner_phone'] = claude_data.get('winner_phone')
+
+        if claude_data.get('award_value'):
+            data['estimated_value'] = award_amount(claude_data['award_value'])
+
+        if claude_data.get('award_date'):
+            try:
+                data['contract_start_date'] = datetime.strptime(claude_data['award_date'], '%Y-%m-%d')
+            except:
+                pass
+
+        logger.info(f"   Winner (Claude): {data['winner_name']}")
+        return True
+
+    def _apply_resultat_award(self, data, resultat_data):
+        if resultat_data and resultat_data.get('winner_name'):
+            data['winner_name'] = resultat_data.get('winner_name')
+            data['winner_city'] = resultat_data.get('winner_city')
+            data['winner_postal_code'] = resultat_data.get('winner_postal_code')
+
+            if resultat_data.get('award_value'):
+                data['estimated_value'] = resultat_data.get('award_value')
+
+            if resultat_data.get('award_date'):
+                data['contract_start_date'] = resultat_data.get('award_date')
+
+            logger.info(f"   Winner (Regex): {data['winner_name']}")
+
+    def parse_date(self, date_str):
+        """Parse French date format to datetime"""
+        return parse_date(date_str)
+
+    def parse_amount(self, amount_str):
+        """Parse amount string to float"""
+        return parse_amount(amount_str)
+
+    def parse_tender(self, tender_data):
+        """Extract ALL fields comprehensively into a ComprehensiveRecord
+
+        Award notices get the Section 4 regex result straight away; one still
+        without a winner carries its `award_text`, which save_to_db queues for
+        LLM enrichment by drain_award_queue().
+        """
+        start = time.perf_counter()
+        html = tender_data.get('html', '')
+        tree = NoticeTree(html)
+        index = LabelIndex(tree)
+
+        # scraped_at is stamped once per batch by save_to_db
+        data = ComprehensiveRecord(
+            idweb=tender_data.get('idweb'),
+            source_id=tender_data.get('idweb'),
+            html_content=html,
+            content_hash=tender_data.get('content_hash') or content_hash(html),
+            parser_version=PARSER_VERSION
+        )
+
+        data.update(COMPREHENSIVE_EXTRACTOR.extract(tree, index, metrics=METRICS))
+        data['detail_url'] = f"https://www.boamp.fr/avis/detail/{data['idweb']}"
+
+        # AWARD INFORMATION (for attribution notices)
+        if data.get('notice_type') and ('attribution' in data['notice_type'].lower() or 'resultat' in data['notice_type'].lower()):
+            logger.info(f"   Extracting award data for {data['idweb']}")
+
+            # Method 2: Regex - Section 4, stored with the notice
+            self._apply_resultat_award(data, self.extract_resultat_section4(tree))
+
+            # Method 1: Claude API - deferred to the award queue
+            if not data.get('winner_name'):
+                data['award_text'] = award_text(tree)
+
+        METRICS.observe('parse_tender_seconds', time.perf_counter() - start)
+        return data
+
+    def parse_batch(self, raw_tenders, pool=None):
+        """Parse a page of raw records, in order, serially or on a process pool"""
+        with METRICS.timer('stage_seconds', stage='parse'):
+            if pool is None:
+                parsed = []
+                for tender in raw_tenders:
+                    try:
+                        parsed_tender = self.parse_tender(tender)
+                        parsed.append(parsed_tender)
+                    except Exception as e:
+                        logger.error(f"Error parsing tender {tender.get('idweb')}: {e}")
+                        METRICS.inc('notices', outcome='parse_failed')
+                        continue
+                return parsed
+
+            # map() yields results in submission order, so save_to_db sees the page as fetched;
+            # each chunk also brings back the worker's timings
+            chunks = [raw_tenders[i:i + PARSE_CHUNKSIZE] for i in range(0, len(raw_tenders), PARSE_CHUNKSIZE)]
+            parsed = []
+            for chunk_parsed, snapshot in pool.map(parse_page_worker, chunks):
+                parsed.extend(chunk_parsed)
+                METRICS.merge(snapshot)
+            return parsed
+
+
+# france_boamp_checkpoint row used by run_daily
+CHECKPOINT_NAME = 'comprehensive'
+
+# Bump whenever parse_tender's output changes; reparse() refreshes older rows
+PARSER_VERSION = 3
+
+# france_boamp_comprehensive columns written by save_to_db, in insert order
+COMPREHENSIVE_COLUMNS = (
+    'idweb', 'source_id', 'internal_ref', 'notice_number', 'notice_type', 'title', 'tender_title',
+    'short_description', 'full_description', 'buyer_name', 'buyer_city', 'buyer_postcode',
+    'buyer_siret', 'buyer_organization_type', 'buyer_sector', 'contact_name', 'contact_email',
+    'contact_phone', 'cpv_codes', 'cpv_primary', 'department', 'published_at', 'deadline',
+    'estimated_value', 'contract_amounts', 'contract_duration_months', 'contract_type',
+    'procurement_method', 'procedure_type', 'has_lots', 'number_of_lots', 'lot_structure',
+    'has_tranches', 'allows_consortia', 'allows_variants', 'requires_site_visit',
+    'reserved_contract', 'execution_location', 'detail_url', 'external_portal_url',
+    'additional_info', 'content_hash', 'winner_name', 'winner_city', 'winner_postal_code',
+    'winner_country', 'winner_email', 'winner_phone', 'contract_start_date', 'parser_version',
+    'scraped_at'
+)
+COLUMN_LIST = ', '.join(COMPREHENSIVE_COLUMNS)
+
+
+class ComprehensiveRecord:
+    """One parsed notice, with a fixed slot per france_boamp_comprehensive column
+
+    Slots follow COMPREHENSIVE_COLUMNS, so row() hands save_to_db the insert
+    tuple in a single attrgetter call. html_content is only kept until the
+    HTML store has written it (see HtmlStore.put_many), and award_text only
+    for award notices still waiting for a winner. Item access and get()
+    mirror the dict parse_tender used to return, for the field fallbacks,
+    award helpers and re-parse comparison.
+    """
+
+    __slots__ = COMPREHENSIVE_COLUMNS + ('html_content', 'award_text')
+
+    row = property(attrgetter(*COMPREHENSIVE_COLUMNS))
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            setattr(self, name, None)
+        self.update(values)
+
+    def update(self, values):
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    def get(self, name, default=None):
+        value = getattr(self, name, None)
+        return default if value is None else value
+
+    def __getitem__(self, name):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __setitem__(self, name, value):
+        try:
+            setattr(self, name, value)
+        except AttributeError:
+            raise KeyError(name) from None
+
+    def __getstate__(self):
+        # A bare tuple keeps records small on their way back from parse workers
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+    def __repr__(self):
+        return f"ComprehensiveRecord(idweb={self.idweb!r})"
+
+# Registry fields parse_tender extracts; the winner columns come from the award path
+COMPREHENSIVE_EXTRACTOR = FieldExtractor([
+    'title', 'notice_number', 'internal_ref', 'notice_type', 'buyer_name', 'buyer_city', 'buyer_postcode',
+    'buyer_siret', 'buyer_organization_type', 'buyer_sector', 'contact_name', 'contact_email',
+    'contact_phone', 'tender_title', 'full_description', 'short_description', 'contract_type',
+    'procedure_type', 'procurement_method', 'cpv_codes', 'cpv_primary', 'deadline', 'published_at',
+    'estimated_value', 'contract_amounts', 'contract_duration_months', 'has_lots', 'has_tranches',
+    'number_of_lots', 'lot_structure', 'execution_location', 'external_portal_url', 'department',
+    'additional_info'
+])
+
+# Columns a re-parse may rewrite; award fields are only ever filled in by it, never
+# cleared, because they may have come from the LLM path that reparse does not run
+REPARSE_COLUMNS = tuple(c for c in COMPREHENSIVE_COLUMNS
+                        if c not in ('idweb', 'content_hash', 'parser_version', 'scraped_at'))
+AWARD_COLUMNS = ('winner_name', 'winner_city', 'winner_postal_code', 'winner_country',
+                 'winner_email', 'winner_phone', 'contract_start_date', 'estimated_value')
+
+# save_to_db outcomes per notice
+WRITE_OUTCOMES = ('inserted', 'updated', 'unchanged')
+
+
+
+def upsert_clause(replay=False):
+    """Upsert tail shared by both write paths
+
+    A stored notice is only rewritten when its source HTML changed. A replay
+    parses recorded HTML, so it does the opposite: it only rewrites rows
+    that still hold that same HTML and were not written by a newer parser,
+    and a notice amended since the recording keeps its current version. As
+    in reparse, award columns are never cleared, and inline html_content of
+    old rows goes since the new version is in the HTML store. Each written
+    row reports its idweb and whether it was inserted (xmax = 0) or updated.
+    """
+    assignments = ', '.join(
+        f"{col} = COALESCE(EXCLUDED.{col}, france_boamp_comprehensive.{col})" if col in AWARD_COLUMNS
+        else f"{col} = EXCLUDED.{col}"
+        for col in COMPREHENSIVE_COLUMNS if col != 'idweb'
+    )
+    if replay:
+        where = """WHERE france_boamp_comprehensive.content_hash = EXCLUDED.content_hash
+      AND COALESCE(france_boamp_comprehensive.parser_version, 0) <= EXCLUDED.parser_version"""
+    else:
+        where = "WHERE france_boamp_comprehensive.content_hash IS DISTINCT FROM EXCLUDED.content_hash"
+    return f"""
+    ON CONFLICT (idweb) DO UPDATE SET {assignments}, html_content = NULL
+    {where}
+    RETURNING idweb, (xmax = 0) AS inserted
+"""
+
+
+UPSERT_CLAUSE = upsert_clause()
+REPLAY_CLAUSE = upsert_clause(replay=True)
+
+# Attempts per queued award notice before drain_award_queue() gives up on it
+MAX_AWARD_ATTEMPTS = 5
+
+
+def copy_text(value):
+    """Encode one value for PostgreSQL COPY text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    return (str(value).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+# Characters copy_expert pulls from a CopyStream per read
+COPY_CHUNK_SIZE = 1 << 20
+
+
+class CopyStream:
+    """Read-only file object over row tuples in COPY text format.
+
+    Rows are encoded lazily as copy_expert pulls chunks, so a batch is never
+    materialised a second time as one big string. Only the line being read
+    is held, with an offset into it: each character is copied once into the
+    chunk that returns it, never into a growing or re-sliced buffer.
+    """
+
+    def __init__(self, rows):
+        self._lines = ('\t'.join(map(copy_text, row)) + '\n' for row in rows)
+        self._line = ''
+        self._pos = 0
+
+    def read(self, size=-1):
+        parts = []
+        wanted = size
+        while size < 0 or wanted > 0:
+            if self._pos == len(self._line):
+                self._line, self._pos = next(self._lines, ''), 0
+                if not self._line:
+                    break
+            end = len(self._line) if size < 0 else min(len(self._line), self._pos + wanted)
+            parts.append(self._line[self._pos:end])
+            wanted -= end - self._pos
+            self._pos = end
+        return ''.join(parts)
+
+
+# Records handed to each parse worker per round trip
+PARSE_CHUNKSIZE = 10
+
+# Per-process parser used by the parse pool (see run_daily(parse_workers=...))
+_worker_parser = None
+
+
+def _init_parse_worker(anthropic_api_key):
+    global _worker_parser
+    _worker_parser = BOAMPNoticeParser(anthropic_api_key)
+    # A forked worker inherits the parent's observations; start from zero
+    METRICS.reset()
+
+
+def parse_tender_worker(tender):
+    """Picklable parse entry point for worker processes; None on failure"""
+    try:
+        return _worker_parser.parse_tender(tender)
+    except Exception as e:
+        logger.error(f"Error parsing tender {tender.get('idweb')}: {e}")
+        METRICS.inc('notices', outcome='parse_failed')
+        return None
+
+
+def parse_page_worker(raw_tenders):
+    """Parse a page (or chunk) in one worker process: (parsed, metrics for the parent to merge)"""
+    parsed = [t for t in map(parse_tender_worker, raw_tenders) if t is not None]
+    return parsed, METRICS.drain()
+
+
+class BOAMPComprehensiveScraper(BOAMPNoticeParser):
+    def __init__(self, cache_dir=None, replay=False):
+        self.base_url = BASE_URL
         self.db_conn = self.connect_db()
-        self.session = requests.Session()
+        # Paced by the client's rate limiter rather than fixed sleeps between pages
+        self.http = HttpClient(rate=float(os.environ.get('BOAMP_API_RATE', DEFAULT_RATE)))
+        self.session = self.http
+        self.replay = replay
+        if cache_dir or replay:
+            # Record every API page on disk, or serve them from there with no network
+            self.session = CachingSession(self.http, ResponseCache(cache_dir or DEFAULT_CACHE_DIR), replay=bool(replay),
+                                          run=replay if isinstance(replay, str) else None)
+            logger.info(f"API cache at {cache_dir or DEFAULT_CACHE_DIR} ({'replay' if replay else 'recording'})")
+        self.html_store = HtmlStore(self.db_conn)
+        self.chunk_leases = ChunkLeases(self.db_conn)
+
+        # idweb -> content_hash of rows confirmed in france_boamp_comprehensive during this run
+        self.known_hashes = {}
 
         # Initialize Claude API for award extraction
-        self.use_claude_for_awards = bool(os.environ.get('ANTHROPIC_API_KEY'))
+        super().__init__(
+            os.environ.get('ANTHROPIC_API_KEY'),
+            award_concurrency=int(os.environ.get('BOAMP_AWARD_CONCURRENCY', DEFAULT_CONCURRENCY)),
+            # Point at a local stand-in of the Messages API to test enrichment
+            award_api_url=os.environ.get('BOAMP_AWARD_API_URL', ANTHROPIC_API_URL),
+            award_cache_dir=os.path.join(cache_dir, 'awards') if cache_dir else None
+        )
         if self.use_claude_for_awards:
-            self.anthropic_api_key = os.environ.get('ANTHROPIC_API_KEY')
-            logger.info("Claude API enabled for award extraction")
+            logger.info("Claude API enabled for award queue enrichment")
         else:
-            logger.info("Claude API disabled (ANTHROPIC_API_KEY not set) - using regex fallback")
+            logger.info("Claude API disabled (ANTHROPIC_API_KEY not set) - awards without a regex winner stay queued")
 
     def connect_db(self):
         try:
-            conn = psycopg2.connect(
-                host='db.hjekfyirwzlybhnnzcjm.supabase.co',
-                port=5432,
-                database='postgres',
-                user='postgres',
-                password=os.environ.get('SUPABASE_DB_PASSWORD', 'Killorgin1973!')
-            )
+            if os.environ.get('BOAMP_DATABASE_URL'):
+                # e.g. a local Postgres for workers under test
+                conn = psycopg2.connect(os.environ['BOAMP_DATABASE_URL'])
+            else:
+                conn = psycopg2.connect(
+                    host='db.hjekfyirwzlybhnnzcjm.supabase.co',
+                    port=5432,
+                    database='postgres',
+                    user='postgres',
+                    password=os.environ.get('SUPABASE_DB_PASSWORD', 'Killorgin1973!')
+                )
             logger.info("Database connected successfully")
             return conn
         except Exception as e:
@@ -139,16 +591,47 @@ class BOAMPComprehensiveScraper:
                     winner_size TEXT,
                     additional_info TEXT,
                     html_content TEXT,
+                    content_hash TEXT,
+                    parser_version INTEGER,
                     scraped_at TIMESTAMP DEFAULT NOW(),
                     created_at TIMESTAMP DEFAULT NOW()
                 )
             """)
 
+            # Raw HTML now lives compressed in france_boamp_html; html_content stays for old rows
+            cursor.execute("ALTER TABLE france_boamp_comprehensive ADD COLUMN IF NOT EXISTS content_hash TEXT")
+            cursor.execute("ALTER TABLE france_boamp_comprehensive ADD COLUMN IF NOT EXISTS parser_version INTEGER")
+            self.html_store.create_tables(cursor)
+            self.chunk_leases.create_tables(cursor)
+
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_boamp_comp_idweb ON france_boamp_comprehensive(idweb)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_boamp_comp_deadline ON france_boamp_comprehensive(deadline)")
             cursor.execute("CREATE INDEX IF NOT EXISTS idx_boamp_comp_cpv ON france_boamp_comprehensive(cpv_primary)")
 
+            # High-water mark of what has been ingested, for incremental runs
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS france_boamp_checkpoint (
+                    name TEXT PRIMARY KEY,
+                    last_idweb TEXT NOT NULL,
+                    last_published_at TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT NOW()
+                )
+            """)
+
+            # Award notices still without a winner, waiting for LLM enrichment
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS france_boamp_award_queue (
+                    idweb TEXT PRIMARY KEY,
+                    award_text TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    last_error TEXT,
+                    enqueued_at TIMESTAMP DEFAULT NOW(),
+                    next_attempt_at TIMESTAMP DEFAULT NOW()
+                )
+            """)
+
             self.db_conn.commit()
+            self.html_store.load_dictionaries()
             logger.info("Comprehensive staging table created/verified")
 
         except Exception as e:
@@ -156,561 +639,848 @@ class BOAMPComprehensiveScraper:
             self.db_conn.rollback()
             raise
 
-    def fetch_recent_tenders(self, hours_back=24, limit=100, offset=0):
-        """Fetch tenders from last N hours"""
-        params = {
-            'limit': limit,
-            'offset': offset,
-            'order_by': 'idweb DESC',
-            'where': 'html IS NOT NULL'
-        }
+    def load_watermark(self):
+        """checkpoint_key() of the newest notice ingested, or None before the first incremental run
 
-        try:
-            response = self.session.get(self.base_url, params=params, timeout=30)
-            response.raise_for_status()
-
-            data = response.json()
-            results = data.get('results', [])
-            total_count = data.get('total_count', 0)
+        Checkpoints written before they carried a publication date are ignored.
+        """
+        cursor = self.db_conn.cursor()
+        cursor.execute(
+            "SELECT last_published_at, last_idweb FROM france_boamp_checkpoint WHERE name = %s",
+            (CHECKPOINT_NAME,)
+        )
+        row = cursor.fetchone()
+        if not row or row[0] is None:
+            return None
+        return (f"{row[0]:%Y-%m-%d}", row[1])
+
+    def _upsert_watermark(self, cursor, key):
+        """Advance the checkpoint to `key`, a checkpoint_key(), never backwards
+
+        Keys compare by publication day, then idweb in byte order (COLLATE
+        "C") as the API sorts it, never by idweb alone.
+        """
+        published, idweb = key
+        cursor.execute("""
+            INSERT INTO france_boamp_checkpoint (name, last_idweb, last_published_at, updated_at)
+            VALUES (%s, %s, %s, NOW())
+            ON CONFLICT (name) DO UPDATE SET
+                last_idweb = EXCLUDED.last_idweb,
+                last_published_at = EXCLUDED.last_published_at,
+                updated_at = NOW()
+            WHERE france_boamp_checkpoint.last_published_at IS NULL
+               OR (france_boamp_checkpoint.last_published_at::date, france_boamp_checkpoint.last_idweb COLLATE "C")
+                  < (EXCLUDED.last_published_at::date, EXCLUDED.last_idweb COLLATE "C")
+        """, (CHECKPOINT_NAME, idweb, published))
+
+    def save_watermark(self, key):
+        cursor = self.db_conn.cursor()
+        self._upsert_watermark(cursor, key)
+        self.db_conn.commit()
+
+    def filter_new(self, raw_tenders):
+        """Drop records already stored with the same HTML before any parsing
+
+        Each record's content_hash is computed from its HTML (and kept on the
+        record for parse_tender); notices that are new or whose HTML changed
+        since they were stored go through. One idweb = ANY(...) query per
+        page; stored hashes are remembered in known_hashes so later pages and
+        re-fetches skip the round trip.
+
+        A replay re-runs the parser on its recorded input, so nothing is dropped.
+        """
+        for r in raw_tenders:
+            r['content_hash'] = content_hash(r.get('html'))
+        if self.replay:
+            return raw_tenders
+        unknown = [r['idweb'] for r in raw_tenders if r.get('idweb') not in self.known_hashes]
+        if unknown:
+            with METRICS.timer('stage_seconds', stage='filter'):
+                cursor = self.db_conn.cursor()
+                cursor.execute(
+                    "SELECT idweb, content_hash FROM france_boamp_comprehensive WHERE idweb = ANY(%s)",
+                    (unknown,)
+                )
+                self.known_hashes.update(cursor.fetchall())
+        new_tenders = [r for r in raw_tenders if self.known_hashes.get(r.get('idweb')) != r['content_hash']]
+        METRICS.inc('notices', len(raw_tenders) - len(new_tenders), outcome='skipped')
+        return new_tenders
+
+    def _enqueue_awards(self, cursor, tenders):
+        """Queue award notices that still lack a winner in the table (caller's transaction)"""
+        rows = [(t['idweb'], t['award_text']) for t in tenders if t.get('award_text')]
+        if rows:
+            execute_values(cursor, """
+                INSERT INTO france_boamp_award_queue (idweb, award_text)
+                SELECT v.idweb, v.award_text
+                FROM (VALUES %s) AS v(idweb, award_text)
+                JOIN france_boamp_comprehensive c ON c.idweb = v.idweb
+                WHERE c.winner_name IS NULL
+                ON CONFLICT (idweb) DO NOTHING
+            """, rows)
 
-            valid_results = [r for r in results if r.get('html') and len(r.get('html', '')) > 100]
+    def fetch_recent_tenders(self, hours_back=24, limit=100, before=None, after=None, published_after=None,
+                             published_before=None, since=None):
+        """Fetch the next page of tenders below `before`, or above `after` walking upwards
 
-            logger.info(f"Fetched {len(valid_results)} valid tenders from offset {offset} (total: {total_count})")
+        published_after and published_before narrow the page server-side to
+        notices published in [published_after, published_before). With
+        `since` (a checkpoint_key()) the page holds the notices after it in
+        publication order, and the returned cursor is a checkpoint_key() too.
+        """
+        try:
+            with METRICS.timer('stage_seconds', stage='fetch'):
+                page = stream_page(
+                    self.session, self.base_url, limit=limit, before=before, after=after,
+                    ascending=after is not None, published_after=published_after,
+                    published_before=published_before, since=since
+                )
+                # Records are filtered as they are decoded, so short or empty
+                # HTML is dropped without ever holding the whole page
+                valid_results = [r for r in page if r.get('html') and len(r.get('html', '')) > 100]
+
+            if since is not None:
+                window = f"published after {since[0]} {since[1] or ''}".rstrip()
+            elif after is not None:
+                window = f"above idweb {after}"
+            else:
+                window = f"below idweb {before}"
+            logger.info(f"Fetched {len(valid_results)} valid tenders {window} (remaining: {page.total_count})")
 
-            return valid_results, total_count
+            return valid_results, page.total_count, page.cursor
 
         except requests.exceptions.RequestException as e:
-            logger.error(f"Error fetching tenders at offset {offset}: {e}")
-            return [], 0
-
-    def extract_field(self, soup, field_patterns, section=None):
-        """Extract field using multiple pattern matching"""
-        if section:
-            section_div = soup.find(id=re.compile(section))
-            if section_div:
-                soup = section_div
-
-        if isinstance(field_patterns, str):
-            field_patterns = [field_patterns]
-
-        for pattern in field_patterns:
-            spans = soup.find_all('span', class_='fr-text--bold')
-            for span in spans:
-                if re.search(pattern, span.text, re.IGNORECASE):
-                    parent = span.parent
-                    if parent:
-                        full_text = parent.get_text()
-                        value = full_text.replace(span.text, '').strip()
-                        if value and value != ':' and len(value) > 0:
-                            return value
-
-            field = soup.find(text=re.compile(pattern, re.IGNORECASE))
-            if field:
-                parent = field.parent
-                if parent:
-                    parent_div = parent.parent if parent.parent else parent
-                    if parent_div:
-                        full_text = parent_div.get_text()
-                        parts = re.split(pattern, full_text, maxsplit=1, flags=re.IGNORECASE)
-                        if len(parts) > 1:
-                            value = parts[1].strip().lstrip(':').strip()
-                            value = re.split(r'\n|<span', value)[0].strip()
-                            if value and len(value) > 0:
-                                return value
-
-        return None
+            # The client already retried; an empty page here would end the run as if complete
+            logger.error(f"Error fetching tenders (before={before}, after={after}, since={since}): {e}")
+            raise
 
-    def extract_resultat_section4(self, soup, html):
-        """Extract winner info from Section 4 plain text format - WITH FIX"""
-        winner_data = {}
+    def save_to_db(self, tenders, checkpoint=None, use_copy=False):
+        """Save comprehensive tender data, returning {'inserted', 'updated', 'unchanged'} counts
 
-        section_4_match = re.search(r'id="section_4"[^>]*>(.*?)</div>\s*<hr', html, re.DOTALL)
-        if not section_4_match:
-            return winner_data
+        New notices are inserted; a stored notice is rewritten only when its
+        content_hash differs (see upsert_clause), otherwise it is left as is.
+        Replays rewrite stored notices with the fresh parse of the same HTML
+        only, never with an older version of an amended notice. The HTML
+        store and the award queue only get the rows actually written.
 
-        section_4_text = section_4_match.group(1)
+        With `checkpoint` (the page's newest_checkpoint()) the checkpoint moves
+        in the same transaction as the rows, and a failed write is re-raised so
+        the run stops rather than moving the watermark past a page that was
+        never stored.
 
-        # Extract award date
-        date_match = re.search(r"Date d'attribution\s*:\s*(\d{2}/\d{2}/\d{2})", section_4_text)
-        if date_match:
-            date_str = date_match.group(1)
-            parts = date_str.split('/')
-            date_str = f"{parts[0]}/{parts[1]}/20{parts[2]}"
-            winner_data['award_date'] = self.parse_date(date_str)
+        use_copy streams the batch with COPY FROM STDIN into a temporary
+        staging table and merges it with a single INSERT ... SELECT, which is
+        far cheaper than execute_values for large backfill batches.
 
-        # Extract award value
-        value_match = re.search(r'Montant\s+Ht\s*:\s*([\d\s,]+)', section_4_text, re.IGNORECASE)
-        if value_match:
-            winner_data['award_value'] = self.parse_amount(value_match.group(1))
-
-        if not winner_data.get('award_value'):
-            value_match2 = re.search(r'Montant[^:]*:\s*[^0-9]*?([\d\s]+)\s*EUR', section_4_text, re.IGNORECASE)
-            if value_match2:
-                winner_data['award_value'] = self.parse_amount(value_match2.group(1))
-
-        # Extract winner - Pattern 1: line after "Marche n : XX.XXX"
-        marche_match = re.search(r'March[^\n]*n[^\n]*:\s*[\d\.]+\s*\n\s*([^\n]+)', section_4_text)
-        if marche_match:
-            winner_line = marche_match.group(1).strip()
-            winner_line = re.sub(r'<[^>]+>', '', winner_line)
-
-            parts = [p.strip() for p in winner_line.split(',')]
+        Rows go straight from each ComprehensiveRecord's slots to the loader;
+        each record's HTML is dropped once the HTML store has compressed it.
+        """
+        counts = dict.fromkeys(WRITE_OUTCOMES, 0)
+        if not tenders:
+            return counts
 
-            # FIX: Check each part - skip government entities
-            for part in parts:
-                if part and not is_government_entity(part):
-                    winner_data['winner_name'] = part
-                    break
+        cursor = self.db_conn.cursor()
+        start = time.perf_counter()
+        op = 'copy' if use_copy else 'insert'
+        upsert = REPLAY_CLAUSE if self.replay else UPSERT_CLAUSE
 
-            if len(parts) >= 2:
-                winner_data['winner_address'] = parts[1]
+        try:
+            # An upsert may touch each idweb only once per statement
+            tenders = list({t.idweb: t for t in tenders}.values())
+            scraped_at = datetime.now()
+            for t in tenders:
+                if t.scraped_at is None:
+                    t.scraped_at = scraped_at
+            values = (t.row for t in tenders)
+
+            if use_copy:
+                # Stream into a session-local staging table, then merge in one statement
+                cursor.execute(f"""
+                    CREATE TEMP TABLE IF NOT EXISTS france_boamp_comprehensive_stage
+                    ON COMMIT DELETE ROWS AS
+                    SELECT {COLUMN_LIST} FROM france_boamp_comprehensive WITH NO DATA
+                """)
+                cursor.copy_expert(
+                    f"COPY france_boamp_comprehensive_stage ({COLUMN_LIST}) FROM STDIN",
+                    CopyStream(values), size=COPY_CHUNK_SIZE
+                )
+                cursor.execute(f"""
+                    INSERT INTO france_boamp_comprehensive ({COLUMN_LIST})
+                    SELECT {COLUMN_LIST} FROM france_boamp_comprehensive_stage
+                    {upsert}
+                """)
+                written = cursor.fetchall()
+            else:
+                written = execute_values(cursor, f"""
+                    INSERT INTO france_boamp_comprehensive ({COLUMN_LIST})
+                    VALUES %s
+                    {upsert}
+                """, values, fetch=True)
+
+            counts['inserted'] = sum(1 for _, inserted in written if inserted)
+            counts['updated'] = len(written) - counts['inserted']
+            counts['unchanged'] = len(tenders) - len(written)
+            written_ids = {idweb for idweb, _ in written}
+            stored = [t for t in tenders if t.idweb in written_ids]
+            self.html_store.put_many(cursor, stored)
+            self._enqueue_awards(cursor, stored)
+            self.known_hashes.update((t.idweb, t.content_hash) for t in stored)
+
+            if checkpoint is not None:
+                self._upsert_watermark(cursor, checkpoint)
 
-            if len(parts) >= 3:
-                last_part = parts[-1]
-                postal_match = re.search(r'(\d{5})\s+(.+)', last_part)
-                if postal_match:
-                    winner_data['winner_postal_code'] = postal_match.group(1)
-                    winner_data['winner_city'] = postal_match.group(2).strip()
+            self.db_conn.commit()
+            METRICS.observe('db_write_seconds', time.perf_counter() - start, op=op)
+            for outcome, count in counts.items():
+                METRICS.inc('notices', count, outcome=outcome)
 
-        # Extract winner - Pattern 2: "Attribution a l'agence NAME"
-        if not winner_data.get('winner_name'):
-            attrib_match = re.search(r'Attribution\s+[^\n]*\s+([^<\n]+)', section_4_text, re.IGNORECASE)
-            if attrib_match:
-                winner_line = attrib_match.group(1).strip()
-                if 'Montant' in winner_line:
-                    winner_line = winner_line.split('Montant')[0].strip()
+            logger.info(f"Saved {counts['inserted']} new tenders, updated {counts['updated']} changed "
+                        f"({counts['unchanged']} unchanged)")
 
-                parts = [p.strip() for p in winner_line.split(' - ')]
+            return counts
 
-                if len(parts) >= 1:
-                    name = re.sub(r"^(l'agence|la societe|le|la|l')\s+", '', parts[0], flags=re.IGNORECASE)
-                    # FIX: Validate it's not a government entity
-                    if name and not is_government_entity(name):
-                        winner_data['winner_name'] = name
+        except Exception as e:
+            logger.error(f"Error saving to database: {e}")
+            self.db_conn.rollback()
+            METRICS.observe('db_write_seconds', time.perf_counter() - start, op=f'{op}_failed')
+            if checkpoint is not None:
+                raise
+            return dict.fromkeys(WRITE_OUTCOMES, 0)
+
+    def run_daily(self, hours_back=24, max_records=1000, batch_size=100, parse_workers=0, incremental=True,
+                  bulk_load=False):
+        """Run comprehensive daily scrape
+
+        parse_workers > 1 parses each page on a process pool of that size.
+
+        With incremental (the default) notices are walked upwards in
+        publication order (dateparution, then idweb) from the stored
+        checkpoint, or from `hours_back` ago before the first run, and the
+        checkpoint advances with every saved page, so a quiet day costs a
+        single empty request and a run cut short by max_records resumes
+        where it stopped. Without incremental the newest max_records notices
+        are walked downwards by idweb.
+
+        bulk_load writes pages through COPY (see save_to_db).
+
+        Replays are never incremental: they are served the recorded run's
+        pages in order, re-parse all of them and leave the live checkpoint alone.
+        """
+        logger.info("="*70)
+        logger.info(f"BOAMP Comprehensive Scraper - Last {hours_back} hours")
+        logger.info("="*70)
 
-                if len(parts) >= 2:
-                    winner_data['winner_address'] = parts[1]
+        self.create_staging_table()
+        incremental, cursor = self._daily_window(hours_back, incremental)
+
+        pool = None
+        if parse_workers and parse_workers > 1:
+            pool = ProcessPoolExecutor(
+                max_workers=parse_workers,
+                initializer=_init_parse_worker,
+                initargs=(self.anthropic_api_key,)
+            )
+            logger.info(f"Parsing with {parse_workers} worker processes")
 
-                if len(parts) >= 3:
-                    last_part = parts[-1]
-                    postal_match = re.search(r'(\d{5})\s+(.+)', last_part)
-                    if postal_match:
-                        winner_data['winner_postal_code'] = postal_match.group(1)
-                        winner_data['winner_city'] = postal_match.group(2).strip().rstrip('-').strip()
+        fetched = 0
+        total_processed = 0
+        total_saved = 0
+        total_updated = 0
+        total_skipped = 0
 
-        # FIX: Final validation
-        if winner_data.get('winner_name') and is_government_entity(winner_data['winner_name']):
-            logger.warning(f"Rejected govt entity as winner: {winner_data['winner_name']}")
-            winner_data['winner_name'] = None
+        try:
+            while fetched < max_records:
+                raw_tenders, _, next_cursor = self._fetch_daily_page(cursor, batch_size, incremental)
 
-        return winner_data
+                if not raw_tenders:
+                    logger.info("No more tenders to process")
+                    break
 
-    def extract_award_with_claude(self, html_content, notice_id):
-        """Use Claude API to extract award data - WITH FIX"""
-        try:
-            soup = BeautifulSoup(html_content, 'lxml')
-            text_content = soup.get_text(separator='\n', strip=True)
+                new_tenders = self.filter_new(raw_tenders)
+                total_skipped += len(raw_tenders) - len(new_tenders)
 
-            if 'Section 4' in text_content:
-                start_idx = text_content.find('Section 4')
-                relevant_text = text_content[start_idx:start_idx+3000]
-            else:
-                relevant_text = text_content[:3000]
-
-            # FIX: Updated prompt with buyer/winner distinction
-            prompt = f"""Extract structured data from this French award notice. Return ONLY valid JSON, no other text.
-
-CRITICAL: Distinguish between BUYER and WINNER:
-- BUYER (Acheteur): Government entity awarding the contract (Mairie, Commune, Ville, Region, Departement, Prefecture, Ministere, Conseil, Hopital, Universite, Lycee, College, Syndicat, SDIS, etc.)
-- WINNER (Titulaire/Attributaire): Private COMPANY that won the contract (SARL, SAS, SA, EURL, commercial businesses)
-
-If you see "Mairie de X", "Commune de X", "Ville de X" - that is the BUYER, NOT the winner!
-
-Required fields (use null if not found):
-- winner_name: Company name that won (NOT a government entity)
-- winner_address: Street address
-- winner_city: City
-- winner_postal_code: 5-digit code
-- winner_country: Country (default "France")
-- award_value: Numeric euros
-- award_date: YYYY-MM-DD
-- contract_number: Contract number
-
-VALIDATION: If winner_name contains Mairie, Commune, Ville, Region, Departement, Prefecture, Ministere, Conseil, Hopital, Universite, you made an error - that's the buyer!
-
-AWARD NOTICE:
-{relevant_text}
-
-JSON only:"""
-
-            response = requests.post(
-                "https://api.anthropic.com/v1/messages",
-                headers={
-                    "x-api-key": self.anthropic_api_key,
-                    "anthropic-version": "2023-06-01",
-                    "content-type": "application/json"
-                },
-                json={
-                    "model": "claude-3-haiku-20240307",
-                    "max_tokens": 1024,
-                    "messages": [{"role": "user", "content": prompt}]
-                },
-                timeout=30
-            )
+                parsed = self.parse_batch(new_tenders, pool=pool)
 
-            response.raise_for_status()
-            result = response.json()
-            content = result['content'][0]['text'].strip()
-            content = re.sub(r'```json\n?|\n?```', '', content)
+                newest = newest_checkpoint(raw_tenders) if incremental else None
+                counts = self.save_to_db(parsed, checkpoint=newest, use_copy=bulk_load)
 
-            award_data = json.loads(content)
+                total_processed += len(parsed)
+                total_saved += counts['inserted']
+                total_updated += counts['updated']
 
-            # FIX: Validate winner is not a government entity
-            if award_data.get('winner_name') and is_government_entity(award_data['winner_name']):
-                logger.warning(f"Claude returned govt as winner: {award_data['winner_name']} - clearing")
-                award_data['winner_name'] = None
+                fetched += batch_size
+                cursor = next_cursor
 
-            return award_data
+                if newest and not new_tenders:
+                    # Nothing to save, but the checkpoint still moves over the page
+                    self.save_watermark(newest)
 
-        except Exception as e:
-            logger.warning(f"Claude extraction failed for {notice_id}: {e}")
-            return {}
+                if cursor is None:
+                    logger.info("Processed all available records")
+                    break
+        finally:
+            if pool is not None:
+                pool.shutdown()
 
-    def parse_date(self, date_str):
-        """Parse French date format to datetime"""
-        if not date_str:
-            return None
-        try:
-            if '/' in date_str:
-                parts = re.search(r'(\d{2})/(\d{2})/(\d{4})(?:\s+(\d{2}):(\d{2}))?', date_str)
-                if parts:
-                    day, month, year = parts.group(1), parts.group(2), parts.group(3)
-                    hour = parts.group(4) if parts.group(4) else '00'
-                    minute = parts.group(5) if parts.group(5) else '00'
-                    return datetime.strptime(f"{day}/{month}/{year} {hour}:{minute}", "%d/%m/%Y %H:%M")
-        except:
-            pass
-        return None
+        logger.info("="*70)
+        logger.info("Comprehensive scrape complete!")
+        logger.info(f"Total processed: {total_processed}")
+        logger.info(f"New records saved: {total_saved}")
+        logger.info(f"Changed records updated: {total_updated}")
+        logger.info(f"Parses skipped (already ingested): {total_skipped}")
+        for line in METRICS.summary('stage_seconds'):
+            logger.info(f"  {line}")
+        logger.info("="*70)
 
-    def parse_amount(self, amount_str):
-        """Parse amount string to float"""
-        if not amount_str:
-            return None
-        clean = amount_str.replace(' ', '').replace('\xa0', '').replace(',', '.').replace('EUR', '').strip()
-        try:
-            return float(clean)
-        except:
-            return None
+        self.cleanup()
 
-    def extract_cpv_codes(self, soup, html):
-        """Extract all CPV codes"""
-        cpv_codes = set()
+        return {
+            'processed': total_processed,
+            'saved': total_saved,
+            'updated': total_updated,
+            'skipped': total_skipped
+        }
 
-        cpv_labels = soup.find_all(text=re.compile(r'Code.*CPV', re.IGNORECASE))
-        for label in cpv_labels:
-            parent = label.parent
-            if parent:
-                next_elem = parent.find_next(['span', 'div'])
-                if next_elem:
-                    match = re.search(r'\b([0-9]{8})\b', next_elem.text)
-                    if match:
-                        cpv_codes.add(match.group(1))
+    def _daily_window(self, hours_back, incremental):
+        """(incremental, first cursor) of a daily run, shared by run_daily and run_pipeline
+
+        Incremental runs start after the checkpoint or, without one, at the
+        first notice published `hours_back` ago.
+        """
+        incremental = incremental and not self.replay
+        if not incremental:
+            return False, None
+        watermark = self.load_watermark()
+        if watermark:
+            logger.info(f"Resuming after checkpoint {watermark[1]} (published {watermark[0]})")
+            return True, watermark
+        return True, (f"{datetime.now() - timedelta(hours=hours_back):%Y-%m-%d}", None)
+
+    def _fetch_daily_page(self, cursor, batch_size, incremental):
+        """Next daily page: upwards in publication order, else downwards from the newest notice"""
+        if incremental:
+            return self.fetch_recent_tenders(limit=batch_size, since=cursor)
+        return self.fetch_recent_tenders(limit=batch_size, before=cursor)
+
+    def run_pipeline(self, hours_back=24, max_records=1000, batch_size=100,
+                     parse_workers=0, queue_size=4, bulk_load=False, incremental=True):
+        """Run the daily scrape as an overlapped fetch -> parse -> save pipeline
+
+        The fetcher walks the idweb cursor ahead of the other stages, pages are
+        parsed on an executor (a process pool when parse_workers > 1) and a
+        single writer streams rows to save_to_db. Stages are joined by queues
+        of `queue_size` pages so memory stays bounded.
+
+        Pages are chosen exactly as in run_daily, in publication order from
+        the checkpoint. The writer saves pages in fetch order and advances the
+        checkpoint with each one, so the checkpoint never passes a page that
+        is still in flight.
+        """
+        logger.info("="*70)
+        logger.info(f"BOAMP Comprehensive Scraper (pipeline) - Last {hours_back} hours")
+        logger.info("="*70)
 
-        for section_id in ['section_4', 'section_5']:
-            section = soup.find(id=section_id)
-            if section:
-                section_text = section.parent.text if section.parent else ''
-                digits = re.findall(r'\b([0-9]{8})\b', section_text)
-                cpv_codes.update(digits)
+        self.create_staging_table()
 
-        all_cpv = re.findall(r'CPV[^0-9]{0,100}([0-9]{8})', html, re.IGNORECASE)
-        cpv_codes.update(all_cpv)
+        stats = asyncio.run(self._pipeline(
+            hours_back, max_records, batch_size, parse_workers, queue_size, bulk_load, incremental=incremental
+        ))
 
-        return sorted(cpv_codes)
+        logger.info("="*70)
+        logger.info("Comprehensive scrape complete!")
+        logger.info(f"Total processed: {stats['processed']}")
+        logger.info(f"New records saved: {stats['saved']}")
+        logger.info(f"Changed records updated: {stats['updated']}")
+        logger.info(f"Parses skipped (already ingested): {stats['skipped']}")
+        for line in METRICS.summary('stage_seconds'):
+            logger.info(f"  {line}")
+        logger.info("="*70)
 
-    def parse_tender(self, tender_data):
-        """Extract ALL fields comprehensively"""
-        html = tender_data.get('html', '')
-        soup = BeautifulSoup(html, 'lxml')
+        self.cleanup()
 
-        if not soup.find():
-            soup = BeautifulSoup(html, 'html.parser')
+        return stats
 
-        data = {
-            'idweb': tender_data.get('idweb'),
-            'source_id': tender_data.get('idweb'),
-            'html_content': html,
-            'scraped_at': datetime.now()
-        }
+    def backfill(self, export_path, batch_size=500, parse_workers=0, queue_size=4, resume=True, bulk_load=True):
+        """Rebuild france_boamp_comprehensive from the dataset export
 
-        # Title
-        title_tag = soup.find('title')
-        data['title'] = title_tag.text.strip() if title_tag else None
-
-        # Notice number
-        for pattern in [r'Annonce n[^\s]*\s*[:]*\s*([A-Z0-9-]+)', r'Avis n[^\s]*\s*[:]*\s*([A-Z0-9-]+)']:
-            match = re.search(pattern, html, re.IGNORECASE)
-            if match:
-                data['notice_number'] = match.group(1).strip()
-                break
-
-        data['internal_ref'] = self.extract_field(soup, ['Identifiant interne', 'Reference'])
-
-        doc_titre = soup.find(id='doc_titre')
-        data['notice_type'] = doc_titre.text.strip() if doc_titre else None
-
-        # Buyer info
-        buyer_span = soup.find('span', class_='fr-text--bold', string=lambda t: 'Nom complet' in t if t else False)
-        if buyer_span and buyer_span.parent:
-            full_text = buyer_span.parent.get_text()
-            value = full_text.replace(buyer_span.text, '').strip()
-            data['buyer_name'] = value if value else None
-
-        if not data.get('buyer_name'):
-            data['buyer_name'] = self.extract_field(soup, "Nom complet de l'acheteur", section='section_1')
-
-        data['buyer_city'] = self.extract_field(soup, 'Ville')
-        data['buyer_postcode'] = self.extract_field(soup, 'Code postal')
-        data['buyer_siret'] = self.extract_field(soup, "N National d'identification")
-        data['buyer_organization_type'] = self.extract_field(soup, ['Forme juridique', 'Type de pouvoir'])
-        data['buyer_sector'] = self.extract_field(soup, 'Activite du pouvoir adjudicateur')
-
-        # Contact
-        data['contact_name'] = self.extract_field(soup, 'Nom du contact')
-        data['contact_email'] = self.extract_field(soup, 'Adresse mail du contact')
-        data['contact_phone'] = self.extract_field(soup, 'Numero de telephone du contact')
-
-        # Tender info
-        data['tender_title'] = self.extract_field(soup, 'Intitule du marche', section='section_4')
-        if not data['tender_title']:
-            data['tender_title'] = data['title']
-
-        data['full_description'] = self.extract_field(soup, ['Description', 'Objet'])
-        data['short_description'] = data['full_description'][:500] if data.get('full_description') else None
-
-        data['contract_type'] = self.extract_field(soup, 'Type de marche')
-        data['procedure_type'] = self.extract_field(soup, 'Type de procedure')
-        data['procurement_method'] = self.extract_field(soup, "Technique d'achat")
-
-        # CPV codes
-        cpv_list = self.extract_cpv_codes(soup, html)
-        data['cpv_codes'] = ','.join(cpv_list) if cpv_list else None
-        data['cpv_primary'] = cpv_list[0] if cpv_list else None
-
-        # Dates
-        deadline_str = self.extract_field(soup, 'Date et heure limite de reception des plis')
-        data['deadline'] = self.parse_date(deadline_str)
-
-        published_str = self.extract_field(soup, "Date d'envoi du present avis")
-        data['published_at'] = self.parse_date(published_str)
-
-        # Financial
-        estimated_value = self.extract_field(soup, 'Valeur estimee')
-        data['estimated_value'] = self.parse_amount(estimated_value)
-
-        # Contract details
-        duration_str = self.extract_field(soup, 'Duree du marche')
-        if duration_str:
-            match = re.search(r'(\d+)', duration_str)
-            if match:
-                data['contract_duration_months'] = int(match.group(1))
-
-        # Lot structure
-        has_lots_str = self.extract_field(soup, 'Marche alloti')
-        data['has_lots'] = has_lots_str == 'Oui' if has_lots_str else None
-
-        has_tranches_str = self.extract_field(soup, 'La consultation comporte des tranches')
-        data['has_tranches'] = has_tranches_str == 'Oui' if has_tranches_str else None
-
-        if data['has_lots']:
-            lot_sections = soup.find_all(text=re.compile('Description du lot', re.IGNORECASE))
-            data['number_of_lots'] = len(lot_sections) if lot_sections else None
-            data['lot_structure'] = 'multiple' if data['number_of_lots'] and data['number_of_lots'] > 1 else 'single'
-
-        # Location
-        data['execution_location'] = self.extract_field(soup, "Lieu principal d'execution")
-
-        # URLs
-        portal_url = self.extract_field(soup, "Autre moyen d'acces")
-        if portal_url and 'http' in portal_url:
-            data['external_portal_url'] = portal_url
+        The boamp-html export is downloaded once to `export_path` (see
+        download_export; an existing file is used as is and a partial one is
+        continued when resume is set), then streamed from disk in batches of
+        batch_size through the same parse -> save pipeline as run_pipeline,
+        with no paging or rate limiting. Rows already in the table are
+        skipped, so an interrupted backfill can simply be run again.
 
-        data['detail_url'] = f"https://www.boamp.fr/avis/detail/{data['idweb']}"
+        The checkpoint is moved to the newest exported notice only once the
+        whole file has been loaded, since the export is not in publication order.
+        """
+        logger.info("="*70)
+        logger.info(f"BOAMP backfill from export {export_path}")
+        logger.info("="*70)
 
-        # Department
-        dept = soup.find(text=re.compile(r'Departement', re.IGNORECASE))
-        if dept:
-            dept_num = dept.find_next('strong')
-            data['department'] = dept_num.text.strip() if dept_num else None
+        self.create_staging_table()
 
-        if not data.get("department") and data.get('buyer_postcode'):
-            data['department'] = data['buyer_postcode'][:2]
+        with METRICS.timer('stage_seconds', stage='download'):
+            download_export(self.http, export_path, resume=resume)
 
-        data['additional_info'] = self.extract_field(soup, 'Autres informations complementaires')
+        newest = {}   # 'key': checkpoint_key() of the newest exported notice so far
 
-        # AWARD INFORMATION (for attribution notices)
-        if data.get('notice_type') and ('attribution' in data['notice_type'].lower() or 'resultat' in data['notice_type'].lower()):
-            logger.info(f"   Extracting award data for {data['idweb']}")
+        def records():
+            for r in iter_export(export_path):
+                if r.get('idweb') and r.get(DATE_FIELD):
+                    newest['key'] = max(newest.get('key', ()), checkpoint_key(r))
+                if r.get('idweb') and len(r.get('html') or '') > MIN_HTML_LENGTH:
+                    yield r
 
-            # Method 1: Claude API
-            if self.use_claude_for_awards and not data.get('winner_name'):
-                claude_data = self.extract_award_with_claude(html, data['idweb'])
-                if claude_data and claude_data.get('winner_name'):
-                    # FIX: Double-check it's not a government entity
-                    if not is_government_entity(claude_data['winner_name']):
-                        data['winner_name'] = claude_data.get('winner_name')
-                        data['winner_city'] = claude_data.get('winner_city')
-                        data['winner_postal_code'] = claude_data.get('winner_postal_code')
-                        data['winner_country'] = claude_data.get('winner_country') or 'France'
-                        data['winner_email'] = claude_data.get('winner_email')
-                        data['winner_phone'] = claude_data.get('winner_phone')
-
-                        if claude_data.get('award_value'):
-                            data['estimated_value'] = float(claude_data['award_value'])
-
-                        if claude_data.get('award_date'):
-                            try:
-                                data['contract_start_date'] = datetime.strptime(claude_data['award_date'], '%Y-%m-%d')
-                            except:
-                                pass
-
-                        logger.info(f"   Winner (Claude): {data['winner_name']}")
-                    else:
-                        logger.warning(f"   Claude returned govt entity: {claude_data['winner_name']} - skipping")
+        stats = asyncio.run(self._pipeline(
+            None, float('inf'), batch_size, parse_workers, queue_size, bulk_load,
+            incremental=False, source=batched(records(), batch_size)
+        ))
 
-            # Method 2: Regex fallback - Section 4
-            if not data.get('winner_name'):
-                resultat_data = self.extract_resultat_section4(soup, html)
-                if resultat_data and resultat_data.get('winner_name'):
-                    data['winner_name'] = resultat_data.get('winner_name')
-                    data['winner_city'] = resultat_data.get('winner_city')
-                    data['winner_postal_code'] = resultat_data.get('winner_postal_code')
+        if newest:
+            self.save_watermark(newest['key'])
 
-                    if resultat_data.get('award_value'):
-                        data['estimated_value'] = resultat_data.get('award_value')
+        logger.info("="*70)
+        logger.info("Backfill complete!")
+        logger.info(f"Total processed: {stats['processed']}")
+        logger.info(f"New records saved: {stats['saved']}")
+        logger.info(f"Changed records updated: {stats['updated']}")
+        logger.info(f"Parses skipped (already ingested): {stats['skipped']}")
+        for line in METRICS.summary('stage_seconds'):
+            logger.info(f"  {line}")
+        logger.info("="*70)
 
-                    if resultat_data.get('award_date'):
-                        data['contract_start_date'] = resultat_data.get('award_date')
+        self.cleanup()
 
-                    logger.info(f"   Winner (Regex): {data['winner_name']}")
+        return stats
 
-        return data
+    def plan_chunks(self, start, end, days=DEFAULT_CHUNK_DAYS):
+        """Split publication dates [start, end) into leasable chunks for run_worker"""
+        self.create_staging_table()
+        return self.chunk_leases.plan(start, end, days)
+
+    def run_worker(self, worker_id=None, batch_size=100, parse_workers=0, bulk_load=True,
+                   lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Ingest planned chunks until none is left, alongside any number of other workers
+
+        Each chunk is walked down by idweb within its publication window,
+        starting from the cursor stored by whoever held it before, through
+        the usual filter -> parse -> save path. After every saved page the
+        lease is renewed and the cursor recorded, so a crashed worker costs
+        at most one page once its lease expires. A worker that finds its
+        lease taken over moves on to the next chunk.
+        """
+        worker_id = worker_id or default_worker_id()
+        logger.info("="*70)
+        logger.info(f"BOAMP chunk worker {worker_id}")
+        logger.info("="*70)
 
-    def save_to_db(self, tenders):
-        """Save comprehensive tender data"""
-        if not tenders:
-            return 0
+        self.create_staging_table()
 
-        cursor = self.db_conn.cursor()
+        pool = None
+        if parse_workers and parse_workers > 1:
+            pool = ProcessPoolExecutor(
+                max_workers=parse_workers,
+                initializer=_init_parse_worker,
+                initargs=(self.anthropic_api_key,)
+            )
 
+        stats = {'chunks': 0, 'processed': 0, 'saved': 0, 'updated': 0, 'skipped': 0}
         try:
-            values = [
-                (
-                    t['idweb'], t.get('source_id'), t.get('internal_ref'), t.get('notice_number'),
-                    t.get('notice_type'), t.get('title'), t.get('tender_title'), t.get('short_description'),
-                    t.get('full_description'), t.get('buyer_name'), t.get('buyer_city'), t.get('buyer_postcode'),
-                    t.get('buyer_siret'), t.get('buyer_organization_type'), t.get('buyer_sector'),
-                    t.get('contact_name'), t.get('contact_email'), t.get('contact_phone'),
-                    t.get('cpv_codes'), t.get('cpv_primary'), t.get('department'),
-                    t.get('published_at'), t.get('deadline'), t.get('estimated_value'),
-                    t.get('contract_amounts'), t.get('contract_duration_months'), t.get('contract_type'),
-                    t.get('procurement_method'), t.get('procedure_type'), t.get('has_lots'),
-                    t.get('number_of_lots'), t.get('lot_structure'), t.get('has_tranches'),
-                    t.get('allows_consortia'), t.get('allows_variants'), t.get('requires_site_visit'),
-                    t.get('reserved_contract'), t.get('execution_location'), t.get('detail_url'),
-                    t.get('external_portal_url'), t.get('additional_info'), t.get('html_content'),
-                    t.get('winner_name'), t.get('winner_city'), t.get('winner_postal_code'),
-                    t.get('winner_country'), t.get('winner_email'), t.get('winner_phone'),
-                    t.get('contract_start_date'), t.get('scraped_at')
-                )
-                for t in tenders
-            ]
+            while True:
+                chunk = self.chunk_leases.claim(worker_id, lease_seconds)
+                if chunk is None:
+                    logger.info("No chunks left to claim")
+                    break
+                logger.info(f"Chunk {chunk.chunk_id}: published {chunk.published_from} to {chunk.published_to}"
+                            + (f", resuming below idweb {chunk.cursor}" if chunk.cursor else ""))
+                try:
+                    finished = self._ingest_chunk(chunk, worker_id, batch_size, pool, bulk_load,
+                                                  lease_seconds, stats)
+                except Exception:
+                    self.db_conn.rollback()
+                    self.chunk_leases.release(chunk, worker_id)
+                    raise
+                if finished and self.chunk_leases.complete(chunk, worker_id):
+                    stats['chunks'] += 1
+        finally:
+            if pool is not None:
+                pool.shutdown()
 
-            execute_values(cursor, """
-                INSERT INTO france_boamp_comprehensive
-                (idweb, source_id, internal_ref, notice_number, notice_type, title, tender_title,
-                 short_description, full_description, buyer_name, buyer_city, buyer_postcode,
-                 buyer_siret, buyer_organization_type, buyer_sector, contact_name, contact_email,
-                 contact_phone, cpv_codes, cpv_primary, department, published_at, deadline,
-                 estimated_value, contract_amounts, contract_duration_months, contract_type,
-                 procurement_method, procedure_type, has_lots, number_of_lots, lot_structure,
-                 has_tranches, allows_consortia, allows_variants, requires_site_visit,
-                 reserved_contract, execution_location, detail_url, external_portal_url,
-                 additional_info, html_content, winner_name, winner_city, winner_postal_code,
-                 winner_country, winner_email, winner_phone, contract_start_date, scraped_at)
-                VALUES %s
-                ON CONFLICT (idweb) DO NOTHING
-            """, values)
+        logger.info("="*70)
+        logger.info(f"Worker {worker_id} done: {stats['chunks']} chunks")
+        logger.info(f"Total processed: {stats['processed']}")
+        logger.info(f"New records saved: {stats['saved']}")
+        logger.info(f"Changed records updated: {stats['updated']}")
+        logger.info(f"Parses skipped (already ingested): {stats['skipped']}")
+        logger.info(f"Chunks by status: {self.chunk_leases.progress()}")
+        logger.info("="*70)
 
-            saved_count = cursor.rowcount
-            self.db_conn.commit()
+        self.cleanup()
 
-            logger.info(f"Saved {saved_count} new tenders (skipped {len(tenders) - saved_count} duplicates)")
+        return stats
 
-            return saved_count
+    def _ingest_chunk(self, chunk, worker_id, batch_size, pool, bulk_load, lease_seconds, stats):
+        """Walk one leased chunk to its end; False if the lease was lost on the way"""
+        cursor = chunk.cursor
+        while True:
+            raw_tenders, _, cursor_next = self.fetch_recent_tenders(
+                limit=batch_size, before=cursor,
+                published_after=chunk.published_from, published_before=chunk.published_to
+            )
+            if not server_filters_enabled():
+                # Without the date filter a chunk would be the whole dataset
+                raise RuntimeError("The API rejected the publication date filter needed for chunked ingestion")
+
+            new_tenders = self.filter_new(raw_tenders)
+            parsed = self.parse_batch(new_tenders, pool=pool)
+            counts = self.save_to_db(parsed, use_copy=bulk_load)
+
+            stats['processed'] += len(parsed)
+            stats['saved'] += counts['inserted']
+            stats['updated'] += counts['updated']
+            stats['skipped'] += len(raw_tenders) - len(new_tenders)
+
+            cursor = cursor_next
+            if cursor is None:
+                return True
+            if not self.chunk_leases.heartbeat(chunk, worker_id, cursor, len(raw_tenders), lease_seconds):
+                logger.warning(f"Lease on chunk {chunk.chunk_id} was taken over - moving on")
+                return False
+
+    async def _pipeline(self, hours_back, max_records, batch_size, parse_workers, queue_size, bulk_load,
+                        incremental=True, source=None):
+        loop = asyncio.get_running_loop()
+        page_queue = asyncio.Queue(maxsize=queue_size)
+        row_queue = asyncio.Queue(maxsize=queue_size)
+        stats = {'processed': 0, 'saved': 0, 'updated': 0, 'skipped': 0}
+
+        fetch_executor = ThreadPoolExecutor(max_workers=1)
+        db_executor = ThreadPoolExecutor(max_workers=1)
+        if parse_workers and parse_workers > 1:
+            parse_executor = ProcessPoolExecutor(
+                max_workers=parse_workers,
+                initializer=_init_parse_worker,
+                initargs=(self.anthropic_api_key,)
+            )
+            parse_page = parse_page_worker
+            parsers = parse_workers
+        else:
+            parse_executor = ThreadPoolExecutor(max_workers=1)
+            parse_page = self.parse_batch
+            parsers = 1
 
-        except Exception as e:
-            logger.error(f"Error saving to database: {e}")
-            self.db_conn.rollback()
-            return 0
+        if source is None:
+            incremental, start = await loop.run_in_executor(
+                db_executor, self._daily_window, hours_back, incremental
+            )
+        else:
+            incremental, start = False, None
+
+        async def fetcher():
+            # Keyset pages are inherently sequential: each cursor comes from the previous page
+            cursor = start
+            fetched = 0
+            seq = 0
+            while fetched < max_records:
+                if source is not None:
+                    # Pages read from a local export instead of the API
+                    raw_tenders = await loop.run_in_executor(fetch_executor, next, source, None)
+                else:
+                    raw_tenders, _, cursor = await loop.run_in_executor(
+                        fetch_executor, self._fetch_daily_page, cursor, batch_size, incremental
+                    )
+                if not raw_tenders:
+                    break
+                new_tenders = await loop.run_in_executor(db_executor, self.filter_new, raw_tenders)
+                stats['skipped'] += len(raw_tenders) - len(new_tenders)
+                # Every page goes through, even with nothing new, so the writer can
+                # move the checkpoint over it in order
+                newest = newest_checkpoint(raw_tenders) if incremental else None
+                await page_queue.put((seq, new_tenders, newest))
+                seq += 1
+                fetched += batch_size
+                if source is None and cursor is None:
+                    break
+
+        async def parser():
+            while True:
+                item = await page_queue.get()
+                if item is None:
+                    break
+                seq, raw_tenders, newest = item
+                parsed = []
+                if raw_tenders:
+                    start = time.perf_counter()
+                    parsed = await loop.run_in_executor(parse_executor, parse_page, raw_tenders)
+                    if parse_page is parse_page_worker:
+                        # parse_batch times itself; worker pages are timed here
+                        parsed, snapshot = parsed
+                        METRICS.merge(snapshot)
+                        METRICS.observe('stage_seconds', time.perf_counter() - start, stage='parse')
+                await row_queue.put((seq, parsed, newest, bool(raw_tenders)))
+
+        async def writer():
+            # Parsers may finish out of order; pages are saved in fetch order
+            pending = {}
+            next_seq = 0
+            while True:
+                item = await row_queue.get()
+                if item is None:
+                    break
+                pending[item[0]] = item
+                while next_seq in pending:
+                    _, parsed, newest, had_new = pending.pop(next_seq)
+                    next_seq += 1
+                    if parsed:
+                        counts = await loop.run_in_executor(
+                            db_executor,
+                            partial(self.save_to_db, checkpoint=newest, use_copy=bulk_load), parsed
+                        )
+                        stats['processed'] += len(parsed)
+                        stats['saved'] += counts['inserted']
+                        stats['updated'] += counts['updated']
+                    elif newest and not had_new:
+                        await loop.run_in_executor(db_executor, self.save_watermark, newest)
+
+        async def fetch_stage():
+            await fetcher()
+            for _ in range(parsers):
+                await page_queue.put(None)
+
+        async def parse_stage():
+            await asyncio.gather(*(parser() for _ in range(parsers)))
+            await row_queue.put(None)
 
-    def run_daily(self, hours_back=24, max_records=1000, batch_size=100):
-        """Run comprehensive daily scrape"""
+        try:
+            await asyncio.gather(fetch_stage(), parse_stage(), writer())
+        finally:
+            fetch_executor.shutdown()
+            parse_executor.shutdown()
+            db_executor.shutdown()
+
+        return stats
+
+    def reparse(self, batch_size=500, parse_workers=0):
+        """Re-run the parser over stored HTML for rows older than PARSER_VERSION
+
+        Rows are streamed through a server-side cursor on a second connection,
+        so the table is never loaded into memory. Each batch is parsed (on a
+        process pool when parse_workers > 1, without LLM calls) and only the
+        columns whose values changed are written back, grouped by changed set.
+        """
         logger.info("="*70)
-        logger.info(f"BOAMP Comprehensive Scraper - Last {hours_back} hours")
+        logger.info(f"BOAMP re-parse to parser version {PARSER_VERSION}")
         logger.info("="*70)
 
         self.create_staging_table()
+        column_types = self._column_types('france_boamp_comprehensive')
 
-        offset = 0
-        total_processed = 0
-        total_saved = 0
+        parser = BOAMPNoticeParser()
+        read_conn = self.connect_db()
+        pool = None
+        try:
+            if parse_workers and parse_workers > 1:
+                pool = ProcessPoolExecutor(max_workers=parse_workers, initializer=_init_parse_worker,
+                                           initargs=(None,))
+
+            reader = read_conn.cursor(name='boamp_reparse')
+            reader.itersize = batch_size
+            reader.execute(f"""
+                SELECT {', '.join('c.' + col for col in REPARSE_COLUMNS)},
+                       c.idweb, c.html_content, h.codec, h.dict_id, h.html
+                FROM france_boamp_comprehensive c
+                LEFT JOIN france_boamp_html h ON h.idweb = c.idweb AND h.content_hash = c.content_hash
+                WHERE COALESCE(c.parser_version, 0) < %s
+            """, (PARSER_VERSION,))
+
+            total_rows = 0
+            total_updated = 0
+            while True:
+                rows = reader.fetchmany(batch_size)
+                if not rows:
+                    break
 
-        while offset < max_records:
-            raw_tenders, total_available = self.fetch_recent_tenders(
-                hours_back=hours_back,
-                limit=batch_size,
-                offset=offset
-            )
+                current = {}
+                raw_tenders = []
+                for row in rows:
+                    idweb, inline_html, codec, dict_id, blob = row[len(REPARSE_COLUMNS):]
+                    html = self.html_store.decompress(codec, dict_id, blob) if blob is not None else inline_html
+                    if not html:
+                        continue
+                    current[idweb] = dict(zip(REPARSE_COLUMNS, row))
+                    raw_tenders.append({'idweb': idweb, 'html': html})
+
+                parsed = parser.parse_batch(raw_tenders, pool=pool)
+
+                total_updated += self._write_reparsed(parsed, current, column_types)
+                total_rows += len(rows)
+                logger.info(f"Re-parsed {total_rows} rows ({total_updated} changed)")
+        finally:
+            read_conn.close()
+            if pool is not None:
+                pool.shutdown()
 
-            if not raw_tenders:
-                logger.info("No more tenders to process")
-                break
+        logger.info("="*70)
+        logger.info(f"Re-parse complete: {total_rows} rows, {total_updated} changed")
+        for line in METRICS.summary('stage_seconds'):
+            logger.info(f"  {line}")
+        logger.info("="*70)
 
-            parsed = []
-            for tender in raw_tenders:
-                try:
-                    parsed_tender = self.parse_tender(tender)
-                    parsed.append(parsed_tender)
-                except Exception as e:
-                    logger.error(f"Error parsing tender {tender.get('idweb')}: {e}")
-                    continue
+        self.cleanup()
 
-            saved_count = self.save_to_db(parsed)
+        return {'reparsed': total_rows, 'changed': total_updated}
 
-            total_processed += len(parsed)
-            total_saved += saved_count
+    def _column_types(self, table):
+        cursor = self.db_conn.cursor()
+        cursor.execute("""
+            SELECT column_name, data_type FROM information_schema.columns
+            WHERE table_name = %s
+        """, (table,))
+        return dict(cursor.fetchall())
+
+    def _write_reparsed(self, parsed, current, column_types):
+        """UPDATE only changed columns, one statement per distinct set of changes"""
+        groups = {}
+        unchanged = []
+        for t in parsed:
+            old = current[t['idweb']]
+            changed = tuple(
+                col for col in REPARSE_COLUMNS
+                if t.get(col) != old[col] and not (col in AWARD_COLUMNS and t.get(col) is None)
+            )
+            if changed:
+                groups.setdefault(changed, []).append(t)
+            else:
+                unchanged.append(t['idweb'])
 
-            offset += batch_size
+        cursor = self.db_conn.cursor()
+        start = time.perf_counter()
+        try:
+            for changed, tenders in groups.items():
+                assignments = ', '.join(f"{col} = v.{col}" for col in changed)
+                template = '(%s, ' + ', '.join(f"%s::{column_types[col]}" for col in changed) + ')'
+                execute_values(cursor, f"""
+                    UPDATE france_boamp_comprehensive AS t
+                    SET {assignments}, parser_version = {PARSER_VERSION}
+                    FROM (VALUES %s) AS v(idweb, {', '.join(changed)})
+                    WHERE t.idweb = v.idweb
+                """, [(t['idweb'],) + tuple(t.get(col) for col in changed) for t in tenders],
+                    template=template, page_size=len(tenders))
+
+            if unchanged:
+                cursor.execute("""
+                    UPDATE france_boamp_comprehensive SET parser_version = %s
+                    WHERE idweb = ANY(%s)
+                """, (PARSER_VERSION, unchanged))
+
+            self._enqueue_awards(cursor, parsed)
 
-            if offset >= total_available:
-                logger.info(f"Processed all available records ({total_available})")
-                break
+            self.db_conn.commit()
+            METRICS.observe('db_write_seconds', time.perf_counter() - start, op='reparse_update')
+            return sum(len(tenders) for tenders in groups.values())
 
-            time.sleep(1)
+        except Exception as e:
+            logger.error(f"Error writing re-parsed rows: {e}")
+            self.db_conn.rollback()
+            raise
 
-        logger.info("="*70)
-        logger.info(f"Comprehensive scrape complete!")
-        logger.info(f"Total processed: {total_processed}")
-        logger.info(f"New records saved: {total_saved}")
-        logger.info("="*70)
+    def drain_award_queue(self, batch_size=50, max_attempts=MAX_AWARD_ATTEMPTS):
+        """Enrich queued award notices with the LLM, batch by batch, until the queue is empty
+
+        Each batch is claimed with FOR UPDATE SKIP LOCKED, so several workers
+        can drain the queue side by side. Extractions run concurrently
+        through the award extractor; winner, value and date are written to
+        rows that still have no winner, and the batch leaves the queue in the
+        same transaction. Failed calls, and answers that cannot be applied,
+        fail only their own row: it is retried on later runs with growing
+        delays, up to max_attempts, with the reason in last_error.
+        """
+        if not self.use_claude_for_awards:
+            logger.error("ANTHROPIC_API_KEY not set - cannot enrich queued awards")
+            return {'enriched': 0, 'no_winner': 0, 'failed': 0}
 
-        self.cleanup()
+        self.create_staging_table()
+        extractor = self.award_extractor()
+        column_types = self._column_types('france_boamp_comprehensive')
+        template = '(%s, ' + ', '.join(f"%s::{column_types[col]}" for col in AWARD_COLUMNS) + ')'
+        stats = {'enriched': 0, 'no_winner': 0, 'failed': 0}
+
+        while True:
+            cursor = self.db_conn.cursor()
+            try:
+                cursor.execute("""
+                    SELECT idweb, award_text FROM france_boamp_award_queue
+                    WHERE attempts < %s AND next_attempt_at <= NOW()
+                    ORDER BY enqueued_at
+                    LIMIT %s
+                    FOR UPDATE SKIP LOCKED
+                """, (max_attempts, batch_size))
+                rows = cursor.fetchall()
+                if not rows:
+                    self.db_conn.commit()
+                    break
 
-        return {
-            'processed': total_processed,
-            'saved': total_saved
-        }
+                updates = []
+                done = []
+                failed = []
+                with METRICS.timer('stage_seconds', stage='enrich'):
+                    extracted = extractor.extract_many(rows)
+                start = time.perf_counter()
+                for (idweb, _), claude_data in zip(rows, extracted):
+                    if claude_data is None:
+                        failed.append((idweb, extractor.errors.pop(idweb, 'extraction failed')))
+                        continue
+                    award = {}
+                    try:
+                        applied = self._apply_claude_award(award, self._validate_claude_award(claude_data))
+                    except Exception as e:
+                        logger.warning(f"Unusable award answer for {idweb}: {e}")
+                        failed.append((idweb, str(e)[:500]))
+                        continue
+                    done.append(idweb)
+                    if applied:
+                        updates.append((idweb,) + tuple(award.get(col) for col in AWARD_COLUMNS))
+                    else:
+                        stats['no_winner'] += 1
+
+                if updates:
+                    execute_values(cursor, f"""
+                        UPDATE france_boamp_comprehensive AS t SET
+                            winner_name = v.winner_name, winner_city = v.winner_city,
+                            winner_postal_code = v.winner_postal_code, winner_country = v.winner_country,
+                            winner_email = v.winner_email, winner_phone = v.winner_phone,
+                            estimated_value = COALESCE(v.estimated_value, t.estimated_value),
+                            contract_start_date = COALESCE(v.contract_start_date, t.contract_start_date)
+                        FROM (VALUES %s) AS v(idweb, {', '.join(AWARD_COLUMNS)})
+                        WHERE t.idweb = v.idweb AND t.winner_name IS NULL
+                    """, updates, template=template, page_size=len(updates))
+                    stats['enriched'] += len(updates)
+
+                if done:
+                    cursor.execute("DELETE FROM france_boamp_award_queue WHERE idweb = ANY(%s)", (done,))
+                if failed:
+                    execute_values(cursor, """
+                        UPDATE france_boamp_award_queue AS q
+                        SET attempts = q.attempts + 1, last_error = v.error,
+                            next_attempt_at = NOW() + make_interval(mins => 5 * power(2, q.attempts)::int)
+                        FROM (VALUES %s) AS v(idweb, error)
+                        WHERE q.idweb = v.idweb
+                    """, failed, page_size=len(failed))
+                    stats['failed'] += len(failed)
+
+                self.db_conn.commit()
+                METRICS.observe('db_write_seconds', time.perf_counter() - start, op='award_update')
+                METRICS.inc('awards', len(updates), outcome='enriched')
+                METRICS.inc('awards', len(failed), outcome='failed')
+                logger.info(f"Award queue: {stats['enriched']} enriched, {stats['no_winner']} without winner, "
+                            f"{stats['failed']} failed")
+
+            except Exception as e:
+                logger.error(f"Error draining award queue: {e}")
+                self.db_conn.rollback()
+                raise
+
+        return stats
 
     def cleanup(self):
         if self.db_conn:
@@ -718,9 +1488,59 @@ JSON only:"""
             logger.info("Database connection closed")
 
 if __name__ == "__main__":
-    scraper = BOAMPComprehensiveScraper()
-    scraper.run_daily(
-        hours_back=24,
-        max_records=1000,
-        batch_size=100
-    )
+    parser = argparse.ArgumentParser(description="BOAMP comprehensive daily scraper")
+    parser.add_argument('--cache-dir', default=os.environ.get('BOAMP_CACHE_DIR'),
+                        help="record raw API pages under this directory")
+    parser.add_argument('--replay', nargs='?', const=True, default=False, metavar='RUN',
+                        help="re-run a recorded run (default: the latest) from the cache instead of the network")
+    parser.add_argument('--reparse', action='store_true',
+                        help="re-run the parser over stored HTML for rows older than PARSER_VERSION")
+    parser.add_argument('--backfill', metavar='EXPORT',
+                        help="rebuild the table from a boamp-html export (.json/.jsonl), downloading it if missing")
+    parser.add_argument('--no-resume', action='store_true',
+                        help="with --backfill, restart a partial export download instead of continuing it")
+    parser.add_argument('--plan-chunks', nargs=2, metavar=('FROM', 'TO'), type=date.fromisoformat,
+                        help="split publication dates [FROM, TO) into chunks for --worker")
+    parser.add_argument('--chunk-days', type=int, default=DEFAULT_CHUNK_DAYS,
+                        help="days of publications per planned chunk")
+    parser.add_argument('--worker', action='store_true',
+                        help="claim and ingest planned chunks until none is left (run one per process/node)")
+    parser.add_argument('--enrich-awards', action='store_true',
+                        help="drain the award queue through the LLM instead of scraping")
+    parser.add_argument('--metrics-out', default=os.environ.get('BOAMP_METRICS_OUT'),
+                        help="write stage/field/HTTP/DB timings here at the end (.prom for Prometheus, else JSON)")
+    parser.add_argument('--profile', help="profile this run into a file (.html with pyinstrument, else cProfile)")
+    args = parser.parse_args()
+
+    scraper = BOAMPComprehensiveScraper(cache_dir=args.cache_dir, replay=args.replay)
+    with profiled(args.profile) if args.profile else nullcontext():
+        if args.enrich_awards:
+            scraper.drain_award_queue()
+            scraper.cleanup()
+        elif args.plan_chunks:
+            scraper.plan_chunks(*args.plan_chunks, days=args.chunk_days)
+            scraper.cleanup()
+        elif args.worker:
+            scraper.run_worker(
+                parse_workers=int(os.environ.get('BOAMP_PARSE_WORKERS', '0')),
+                lease_seconds=int(os.environ.get('BOAMP_LEASE_SECONDS', DEFAULT_LEASE_SECONDS))
+            )
+        elif args.backfill:
+            scraper.backfill(
+                args.backfill,
+                parse_workers=int(os.environ.get('BOAMP_PARSE_WORKERS', os.cpu_count() or 1)),
+                resume=not args.no_resume
+            )
+        elif args.reparse:
+            scraper.reparse(parse_workers=int(os.environ.get('BOAMP_PARSE_WORKERS', '0')))
+        else:
+            run = scraper.run_pipeline if os.environ.get('BOAMP_PIPELINE') else scraper.run_daily
+            run(
+                hours_back=24,
+                max_records=1000,
+                batch_size=100,
+                parse_workers=int(os.environ.get('BOAMP_PARSE_WORKERS', '0')),
+                bulk_load=bool(os.environ.get('BOAMP_BULK_LOAD'))
+            )
+    if args.metrics_out:
+        METRICS.write(args.metrics_out)
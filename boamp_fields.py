@@ -0,0 +1,344 @@
+import re
+import time
+from datetime import datetime
+
+from boamp_tree import LabelIndex, NoticeTree, TITLE_XPATH
+
+
+def parse_date(date_str):
+    """Parse French date format to datetime"""
+    if not date_str:
+        return None
+    try:
+        if '/' in date_str:
+            parts = re.search(r'(\d{2})/(\d{2})/(\d{4})(?:\s+(\d{2}):(\d{2}))?', date_str)
+            if parts:
+                day, month, year = parts.group(1), parts.group(2), parts.group(3)
+                hour = parts.group(4) if parts.group(4) else '00'
+                minute = parts.group(5) if parts.group(5) else '00'
+                return datetime.strptime(f"{day}/{month}/{year} {hour}:{minute}", "%d/%m/%Y %H:%M")
+    except:
+        pass
+    return None
+
+
+def parse_amount(amount_str):
+    """Parse amount string to float"""
+    if not amount_str:
+        return None
+    clean = (amount_str.replace(' ', '').replace('\xa0', '').replace(',', '.')
+             .replace('EUR', '').replace('€', '').strip())
+    try:
+        return float(clean)
+    except:
+        return None
+
+
+def parse_yes_no(value):
+    return value == 'Oui'
+
+
+def parse_months(value):
+    match = re.search(r'(\d+)', value)
+    return int(match.group(1)) if match else None
+
+
+def http_only(value):
+    return value if 'http' in value else None
+
+
+class Label:
+    """Look a value up by label in the LabelIndex, optionally inside a section
+
+    `section` is an id regex (e.g. 'section_4') or a callable(tree, index)
+    returning the element to search in (None means the field is absent).
+    """
+
+    def __init__(self, patterns, section=None):
+        self.patterns = (patterns,) if isinstance(patterns, str) else tuple(patterns)
+        self.section = section
+
+    def __call__(self, tree, index, data):
+        section = self.section
+        if callable(section):
+            section = section(tree, index)
+            if section is None:
+                return None
+        return index.get(self.patterns, section=section)
+
+
+class Field:
+    """One output field: lookups tried in order, a converter and a fallback
+
+    Each lookup is a Label or a callable(tree, index, data); the first one
+    that does not return None wins, and `convert` is applied to it. When the
+    result is falsy, `fallback(data)` may supply a value derived from fields
+    extracted earlier (those named in `requires`).
+    """
+
+    def __init__(self, name, *lookups, convert=None, fallback=None, requires=()):
+        self.name = name
+        self.lookups = lookups
+        self.convert = convert
+        self.fallback = fallback
+        self.requires = tuple(requires)
+
+    def extract(self, tree, index, data):
+        value = None
+        for lookup in self.lookups:
+            value = lookup(tree, index, data)
+            if value is not None:
+                break
+        if value is not None and self.convert:
+            value = self.convert(value)
+        if not value and self.fallback:
+            derived = self.fallback(data)
+            if derived is not None:
+                value = derived
+        return value
+
+
+# --- lookups that are not plain labels ---------------------------------------
+
+NOTICE_NUMBER_RES = [re.compile(r'Annonce n[^\s]*\s*[:]*\s*([A-Z0-9-]+)', re.IGNORECASE),
+                     re.compile(r'Avis n[^\s]*\s*[:]*\s*([A-Z0-9-]+)', re.IGNORECASE)]
+CPV_LABEL_RE = re.compile(r'Code.*CPV', re.IGNORECASE)
+CPV_CODE_RE = re.compile(r'\b([0-9]{8})\b')
+CPV_INLINE_RE = re.compile(r'CPV[^0-9]{0,100}([0-9]{8})', re.IGNORECASE)
+LOT_LABEL_RE = re.compile('Description du lot', re.IGNORECASE)
+AMOUNT_RE = re.compile(r'(\d[\d\s,]*)\s*euro\(s\)\s*(?:HT|Ht|ht)', re.IGNORECASE)
+LAUREAT_RE = re.compile('Lauréat de ces lots')
+
+
+def title(tree, index, data):
+    title_tag = tree.first(TITLE_XPATH)
+    return tree.text(title_tag).strip() if title_tag is not None else None
+
+
+def notice_type(tree, index, data):
+    doc_titre = tree.by_id('doc_titre')
+    return tree.text(doc_titre).strip() if doc_titre is not None else None
+
+
+def notice_number_in_html(tree, index, data):
+    for pattern in NOTICE_NUMBER_RES:
+        match = pattern.search(tree.html)
+        if match:
+            return match.group(1).strip()
+    return None
+
+
+def text_after(pattern, tag, flags=re.IGNORECASE):
+    """Lookup: text of the first <tag> after the first string matching `pattern`"""
+    pattern_re = re.compile(pattern, flags)
+
+    def lookup(tree, index, data):
+        found = tree.find_strings(pattern_re)
+        if not found:
+            return None
+        element = tree.find_next(found[0][0], (tag,))
+        return tree.text(element).strip() if element is not None else None
+    return lookup
+
+
+def buyer_name_label(tree, index, data):
+    """Value of the first bold label whose only string mentions 'Nom complet'"""
+    label = next((entry for entry in index.labels if entry[3] and 'Nom complet' in entry[3]), None)
+    return label[2] or None if label else None
+
+
+def cpv_codes(tree, index, data):
+    """All CPV codes: after 'Code CPV' labels, in sections 4-5 and inline in the HTML"""
+    codes = set()
+
+    for _, _, _, parent in tree.find_strings(CPV_LABEL_RE):
+        next_elem = tree.find_next(parent, ('span', 'div'))
+        if next_elem is not None:
+            match = CPV_CODE_RE.search(tree.text(next_elem))
+            if match:
+                codes.add(match.group(1))
+
+    # Both sections usually share one parent; scan its text once
+    parents = []
+    for section_id in ['section_4', 'section_5']:
+        section = tree.sections.get(section_id)
+        if section is not None and section.node is not None and section.node.getparent() not in parents:
+            parents.append(section.node.getparent())
+    for parent in parents:
+        codes.update(CPV_CODE_RE.findall(tree.text(parent)))
+
+    codes.update(CPV_INLINE_RE.findall(tree.html))
+
+    return ','.join(sorted(codes)) if codes else None
+
+
+def number_of_lots(tree, index, data):
+    if not data.get('has_lots'):
+        return None
+    return len(tree.find_strings(LOT_LABEL_RE)) or None
+
+
+def lot_structure(tree, index, data):
+    if not data.get('has_lots'):
+        return None
+    return 'multiple' if data['number_of_lots'] and data['number_of_lots'] > 1 else 'single'
+
+
+def contract_amounts(tree, index, data):
+    amounts = AMOUNT_RE.findall(tree.html)
+    return ','.join([a.replace(' ', '').replace(',', '') for a in amounts[:3]]) if amounts else None
+
+
+def _section_div(element):
+    """Closest <div class="section"> at or above `element`"""
+    while element is not None:
+        if element.tag == 'div' and 'section' in (element.get('class') or '').split():
+            return element
+        element = element.getparent()
+    return None
+
+
+def winner_block(tree, index):
+    """eForms organisation block holding 'Lauréat de ces lots' (the awarded operator)"""
+    found = tree.find_strings(LAUREAT_RE)
+    if not found or found[0][3] is None:
+        return None
+    org_section = _section_div(found[0][3])
+    if org_section is None:
+        return None
+    return _section_div(org_section.getparent())
+
+
+# --- the registry ------------------------------------------------------------
+# Every parser extracts its fields from here. Lookups after the first are
+# fallbacks: later label variants cover the accented and eForms wordings.
+
+FIELDS = (
+    Field('title', title),
+    Field('notice_number', notice_number_in_html, text_after(r'Annonce n°', 'strong')),
+    Field('internal_ref', Label(['Identifiant interne', 'Reference'])),
+    Field('procedure_id', Label('Identifiant de la proc[eé]dure')),
+    Field('notice_type', notice_type),
+
+    Field('buyer_name', buyer_name_label, Label("Nom complet de l'acheteur", section='section_1'),
+          Label('Nom officiel', section='section_1')),
+    Field('buyer_city', Label('Ville')),
+    Field('buyer_postcode', Label('Code postal')),
+    Field('buyer_siret', Label("N National d'identification")),
+    Field('buyer_organization_type', Label(['Forme juridique', 'Type de pouvoir'])),
+    Field('buyer_sector', Label('Activite du pouvoir adjudicateur'),
+          Label('Activité du pouvoir adjudicateur')),
+
+    Field('contact_name', Label('Nom du contact')),
+    Field('contact_email', Label('Adresse mail du contact')),
+    Field('contact_phone', Label('Numero de telephone du contact')),
+
+    Field('tender_title', Label('Intitule du marche', section='section_4'), Label('Titre', section='section_2'),
+          fallback=lambda data: data.get('title'), requires=('title',)),
+    Field('full_description', Label(['Description', 'Objet'])),
+    Field('short_description',
+          fallback=lambda data: data['full_description'][:500] if data.get('full_description') else None,
+          requires=('full_description',)),
+
+    Field('contract_type', Label('Type de marche')),
+    Field('procedure_type', Label('Type de procedure'), Label('Type de procédure')),
+    Field('procurement_method', Label("Technique d'achat")),
+
+    Field('cpv_codes', cpv_codes),
+    Field('cpv_primary', fallback=lambda data: data['cpv_codes'].split(',')[0] if data.get('cpv_codes') else None,
+          requires=('cpv_codes',)),
+
+    Field('deadline', Label('Date et heure limite de reception des plis'), convert=parse_date),
+    Field('published_at', Label("Date d'envoi du present avis"), Label("Date d'envoi de l'avis"),
+          convert=parse_date),
+
+    Field('estimated_value', Label('Valeur estimee'), Label('Valeur estimée'), convert=parse_amount),
+    Field('contract_amounts', contract_amounts),
+    Field('contract_duration_months', Label('Duree du marche'), convert=parse_months),
+
+    Field('has_lots', Label('Marche alloti'), convert=parse_yes_no),
+    Field('has_tranches', Label('La consultation comporte des tranches'), convert=parse_yes_no),
+    Field('number_of_lots', number_of_lots, requires=('has_lots',)),
+    Field('lot_structure', lot_structure, requires=('has_lots', 'number_of_lots')),
+
+    Field('execution_location', Label("Lieu principal d'execution")),
+    Field('external_portal_url', Label("Autre moyen d'acces"), convert=http_only),
+
+    Field('department', text_after(r'Departement', 'strong'), text_after(r'Département', 'strong'),
+          fallback=lambda data: data['buyer_postcode'][:2] if data.get('buyer_postcode') else None,
+          requires=('buyer_postcode',)),
+
+    Field('additional_info', Label('Autres informations complementaires')),
+
+    Field('winner_name', Label('Nom officiel', section=winner_block)),
+    Field('winner_email', Label('Adresse électronique', section=winner_block)),
+    Field('winner_phone', Label('Téléphone', section=winner_block)),
+    Field('winner_city', Label('Ville', section=winner_block)),
+    Field('winner_postal_code', Label('Code postal', section=winner_block)),
+    Field('winner_country', Label('Pays', section=winner_block)),
+    Field('winner_size', Label("Taille de l'opérateur économique", section=winner_block)),
+)
+
+FIELDS_BY_NAME = {field.name: field for field in FIELDS}
+
+
+class FieldExtractor:
+    """Extractor compiled from the registry for a set of field names
+
+    Dependencies named in `requires` are pulled in, fields run in registry
+    order, and the label patterns of all selected fields are grouped by
+    section so LabelIndex.prefetch() resolves each section in one pass
+    instead of one scan per field.
+    """
+
+    def __init__(self, names, fields=FIELDS):
+        by_name = {field.name: field for field in fields}
+        wanted = set()
+        stack = list(names)
+        while stack:
+            name = stack.pop()
+            if name not in wanted:
+                wanted.add(name)
+                stack.extend(by_name[name].requires)
+
+        self.names = tuple(names)
+        self.fields = [field for field in fields if field.name in wanted]
+
+        self.sections = {}    # static section -> label patterns
+        for field in self.fields:
+            for lookup in field.lookups:
+                if isinstance(lookup, Label) and not callable(lookup.section):
+                    self.sections.setdefault(lookup.section, []).extend(lookup.patterns)
+
+    def extract(self, tree, index=None, metrics=None):
+        """Return {name: value} for the selected fields of one parsed notice
+
+        With a boamp_metrics.Metrics, the time spent in each field is
+        recorded in its 'field_seconds' histogram ('prefetch' for the label
+        pass shared by all of them).
+        """
+        if not isinstance(tree, NoticeTree):
+            tree = NoticeTree(tree)
+        if index is None:
+            index = LabelIndex(tree)
+
+        if metrics is None:
+            for section, patterns in self.sections.items():
+                index.prefetch(patterns, section)
+            data = {}
+            for field in self.fields:
+                data[field.name] = field.extract(tree, index, data)
+            return {name: data[name] for name in self.names}
+
+        start = time.perf_counter()
+        for section, patterns in self.sections.items():
+            index.prefetch(patterns, section)
+        timings = [('prefetch', time.perf_counter() - start)]
+
+        data = {}
+        for field in self.fields:
+            start = time.perf_counter()
+            data[field.name] = field.extract(tree, index, data)
+            timings.append((field.name, time.perf_counter() - start))
+        metrics.observe_many('field_seconds', 'field', timings)
+        return {name: data[name] for name in self.names}
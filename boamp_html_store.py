@@ -0,0 +1,281 @@
+import hashlib
+import logging
+import sys
+import zlib
+from collections import Counter
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# zlib preset dictionaries are capped at the 32 KiB window
+DICT_SIZE = 32 * 1024
+ZLIB_LEVEL = 9
+ZSTD_LEVEL = 10
+
+
+def content_hash(html):
+    """SHA-256 of the notice HTML, used to key stored versions"""
+    return hashlib.sha256((html or '').encode('utf-8')).hexdigest()
+
+
+def default_codec():
+    return 'zstd' if zstandard is not None else 'zlib'
+
+
+def train_dictionary(samples, codec=None, size=DICT_SIZE):
+    """Train a compression dictionary on sample notice HTML strings
+
+    zstd uses its own trainer; for zlib the dictionary is the most frequent
+    markup lines, most frequent last since zlib favours the end of the window.
+    """
+    codec = codec or default_codec()
+    encoded = [s.encode('utf-8') for s in samples if s]
+
+    if codec == 'zstd':
+        return zstandard.train_dictionary(size, encoded).as_bytes()
+
+    counts = Counter(line.strip() for s in encoded for line in s.splitlines() if line.strip())
+    chosen = []
+    total = 0
+    for line, count in counts.most_common():
+        if count < 2 or total + len(line) + 1 > size:
+            break
+        chosen.append(line)
+        total += len(line) + 1
+    return b'\n'.join(reversed(chosen))
+
+
+class HtmlStore:
+    """Compressed raw-HTML side table (france_boamp_html) keyed by idweb and content hash.
+
+    Notice HTML is kept out of the main tables' heap: each version is stored
+    once, compressed with zstd when available (zlib otherwise) against a
+    dictionary trained on BOAMP markup. Dictionaries live in
+    france_boamp_html_dict so any reader can decompress any row; get() hides
+    all of this from callers that need the HTML back.
+    """
+
+    def __init__(self, db_conn, codec=None):
+        self.db_conn = db_conn
+        self.codec = codec or default_codec()
+        self.dictionaries = {}    # dict_id -> (codec, bytes)
+        self.dict_id = None       # dictionary used for new rows
+        # Built once per dictionary: zstd (de)compressors are reused as is, zlib
+        # objects are primed with the dictionary and copied for each notice.
+        # Like the DB connection, a store is meant for one thread at a time.
+        self._compressors = {}    # dict_id -> compressor for self.codec
+        self._decompressors = {}  # (codec, dict_id) -> decompressor
+
+    def create_tables(self, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS france_boamp_html_dict (
+                dict_id TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                data BYTEA NOT NULL,
+                created_at TIMESTAMP DEFAULT NOW()
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS france_boamp_html (
+                idweb TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                codec TEXT NOT NULL,
+                dict_id TEXT REFERENCES france_boamp_html_dict(dict_id),
+                raw_size INTEGER,
+                html BYTEA NOT NULL,
+                stored_at TIMESTAMP DEFAULT NOW(),
+                PRIMARY KEY (idweb, content_hash)
+            )
+        """)
+
+    def load_dictionaries(self):
+        """Load all dictionaries; the newest one for our codec compresses new rows"""
+        cursor = self.db_conn.cursor()
+        cursor.execute("SELECT dict_id, codec, data FROM france_boamp_html_dict ORDER BY created_at")
+        for dict_id, codec, data in cursor.fetchall():
+            self.dictionaries[dict_id] = (codec, bytes(data))
+            if codec == self.codec:
+                self.dict_id = dict_id
+
+    def train(self, samples):
+        """Train a dictionary on sample HTML, store it and use it for new rows"""
+        data = train_dictionary(samples, self.codec)
+        dict_id = hashlib.sha256(data).hexdigest()[:16]
+
+        cursor = self.db_conn.cursor()
+        cursor.execute("""
+            INSERT INTO france_boamp_html_dict (dict_id, codec, data)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (dict_id) DO NOTHING
+        """, (dict_id, self.codec, psycopg2.Binary(data)))
+        self.db_conn.commit()
+
+        self.dictionaries[dict_id] = (self.codec, data)
+        self.dict_id = dict_id
+        logger.info(f"Trained {self.codec} dictionary {dict_id} ({len(data)} bytes) on {len(samples)} notices")
+        return dict_id
+
+    def _compressor(self, dict_id):
+        compressor = self._compressors.get(dict_id)
+        if compressor is None:
+            data = self.dictionaries[dict_id][1] if dict_id else None
+            if self.codec == 'zstd':
+                dictionary = zstandard.ZstdCompressionDict(data) if data else None
+                compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL, dict_data=dictionary)
+            else:
+                compressor = zlib.compressobj(ZLIB_LEVEL, zdict=data) if data else zlib.compressobj(ZLIB_LEVEL)
+            self._compressors[dict_id] = compressor
+        return compressor
+
+    def _decompressor(self, codec, dict_id):
+        decompressor = self._decompressors.get((codec, dict_id))
+        if decompressor is None:
+            data = self.dictionaries[dict_id][1] if dict_id else None
+            if codec == 'zstd':
+                if zstandard is None:
+                    raise RuntimeError("zstandard is required to read zstd-compressed notices")
+                dictionary = zstandard.ZstdCompressionDict(data) if data else None
+                decompressor = zstandard.ZstdDecompressor(dict_data=dictionary)
+            else:
+                decompressor = zlib.decompressobj(zdict=data) if data else zlib.decompressobj()
+            self._decompressors[(codec, dict_id)] = decompressor
+        return decompressor
+
+    def compress(self, html):
+        raw = html.encode('utf-8')
+        compressor = self._compressor(self.dict_id)
+
+        if self.codec == 'zstd':
+            return compressor.compress(raw)
+
+        compressor = compressor.copy()
+        return compressor.compress(raw) + compressor.flush()
+
+    def decompress(self, codec, dict_id, blob):
+        decompressor = self._decompressor(codec, dict_id)
+        blob = bytes(blob)
+
+        if codec == 'zstd':
+            return decompressor.decompress(blob).decode('utf-8')
+
+        decompressor = decompressor.copy()
+        return (decompressor.decompress(blob) + decompressor.flush()).decode('utf-8')
+
+    def put_many(self, cursor, tenders):
+        """Store the HTML of parsed tenders (inside the caller's transaction)
+
+        Each tender's html_content is cleared once compressed, so a batch
+        does not keep the raw HTML alive after this call.
+        """
+        rows = []
+        for t in tenders:
+            html = t.get('html_content')
+            if not html:
+                continue
+            rows.append((
+                t['idweb'], t.get('content_hash') or content_hash(html), self.codec, self.dict_id,
+                len(html), psycopg2.Binary(self.compress(html))
+            ))
+            t['html_content'] = None
+
+        if rows:
+            execute_values(cursor, """
+                INSERT INTO france_boamp_html (idweb, content_hash, codec, dict_id, raw_size, html)
+                VALUES %s
+                ON CONFLICT (idweb, content_hash) DO NOTHING
+            """, rows)
+        return len(rows)
+
+    def get(self, idweb, content_hash=None):
+        """Return the decompressed HTML of a notice (latest version unless a hash is given)"""
+        cursor = self.db_conn.cursor()
+        if content_hash:
+            cursor.execute("""
+                SELECT codec, dict_id, html FROM france_boamp_html
+                WHERE idweb = %s AND content_hash = %s
+            """, (idweb, content_hash))
+        else:
+            cursor.execute("""
+                SELECT codec, dict_id, html FROM france_boamp_html
+                WHERE idweb = %s ORDER BY stored_at DESC LIMIT 1
+            """, (idweb,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+
+        codec, dict_id, blob = row
+        if dict_id and dict_id not in self.dictionaries:
+            self.load_dictionaries()
+        return self.decompress(codec, dict_id, blob)
+
+    def migrate(self, table, batch_size=500):
+        """Move inline html_content of `table` into the side table, batch by batch
+
+        The main table only shrinks on disk after a VACUUM FULL (or pg_repack).
+        """
+        moved = 0
+        while True:
+            cursor = self.db_conn.cursor()
+            cursor.execute(f"""
+                SELECT idweb, html_content FROM {table}
+                WHERE html_content IS NOT NULL
+                LIMIT %s
+            """, (batch_size,))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+
+            tenders = [{'idweb': idweb, 'html_content': html} for idweb, html in rows]
+            for t in tenders:
+                t['content_hash'] = content_hash(t['html_content'])
+
+            self.put_many(cursor, tenders)
+            execute_values(cursor, f"""
+                UPDATE {table} AS t SET html_content = NULL, content_hash = v.content_hash
+                FROM (VALUES %s) AS v(idweb, content_hash)
+                WHERE t.idweb = v.idweb
+            """, [(t['idweb'], t['content_hash']) for t in tenders])
+            self.db_conn.commit()
+
+            moved += len(rows)
+            logger.info(f"Moved HTML of {moved} notices out of {table}")
+
+        return moved
+
+
+if __name__ == "__main__":
+    # python boamp_html_store.py train [sample_size] | migrate [table]
+    from boamp_daily_scraper import BOAMPComprehensiveScraper
+
+    scraper = BOAMPComprehensiveScraper()
+    scraper.create_staging_table()
+    store = scraper.html_store
+
+    if sys.argv[1:2] == ['train']:
+        sample_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+        cursor = scraper.db_conn.cursor()
+        # Inline HTML not yet migrated is the cheapest sample source
+        cursor.execute("""
+            SELECT html_content FROM france_boamp_comprehensive
+            WHERE html_content IS NOT NULL
+            ORDER BY random() LIMIT %s
+        """, (sample_size,))
+        samples = [row[0] for row in cursor.fetchall()]
+        if not samples:
+            cursor.execute("""
+                SELECT idweb, content_hash FROM france_boamp_html
+                ORDER BY random() LIMIT %s
+            """, (sample_size,))
+            samples = [store.get(idweb, h) for idweb, h in cursor.fetchall()]
+        store.train(samples)
+    elif sys.argv[1:2] == ['migrate']:
+        store.migrate(sys.argv[2] if len(sys.argv) > 2 else 'france_boamp_comprehensive')
+
+    scraper.cleanup()
@@ -0,0 +1,156 @@
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from boamp_metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Requests per second to the OpenDataSoft API; the limiter never exceeds it and
+# backs off below it while the API is throttling
+DEFAULT_RATE = 5.0
+MIN_RATE = 0.2
+DEFAULT_POOL_SIZE = 4
+MAX_RETRIES = 6
+MAX_BACKOFF = 60
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+THROTTLE_STATUSES = {429, 503}
+
+
+def retry_after(response):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP date), or None"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def backoff_delay(attempt):
+    """Jittered exponential delay for retry `attempt` (0-based), capped at MAX_BACKOFF"""
+    return min(MAX_BACKOFF, 2 ** attempt) * (0.5 + random.random() / 2)
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose rate adapts to throttling (AIMD)
+
+    acquire() blocks until a token is available. throttled() halves the
+    rate (down to min_rate) and can pause every caller until a Retry-After
+    has passed; each success then adds back a little, so the rate climbs to
+    max_rate again once the API stops pushing back.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=None, min_rate=MIN_RATE):
+        self.max_rate = rate
+        self.min_rate = min(min_rate, rate)
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+        self._resume_at = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take one token, sleeping as long as needed; returns the time waited"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if now < self._resume_at:
+                    delay = self._resume_at - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return waited
+                else:
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+    def throttled(self, pause=None):
+        """The server pushed back: halve the rate and optionally pause everyone"""
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = min(self.tokens, 0.0)
+            if pause:
+                self._resume_at = max(self._resume_at, time.monotonic() + pause)
+        logger.warning(f"API throttling - request rate lowered to {self.rate:.2f}/s")
+
+    def succeeded(self):
+        with self._lock:
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate / 20)
+
+
+class HttpClient:
+    """requests.Session with rate limiting and retries, shared by the scrapers
+
+    Every request takes a token from the bucket first. 429/503 answers lower
+    the rate and wait out their Retry-After (or a jittered exponential
+    backoff); other 5xx answers and connection errors or timeouts are retried
+    the same way, up to max_retries, after which the last error is raised so
+    a run fails loudly instead of ending early as if the data had run out.
+
+    `pool_size` sizes the connection pool for that many concurrent fetches.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=None, pool_size=DEFAULT_POOL_SIZE, max_retries=MAX_RETRIES,
+                 session=None):
+        self.session = session or requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # Pages are mostly notice HTML, which compresses several times over
+        self.session.headers['Accept-Encoding'] = 'gzip, deflate'
+        self.limiter = TokenBucket(rate, burst)
+        self.max_retries = max_retries
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            waited = self.limiter.acquire()
+            if waited:
+                METRICS.observe('rate_limit_wait_seconds', waited)
+
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                if attempt == self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                logger.warning(f"{method} {url} failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+                METRICS.inc('http_retries', reason='connection')
+                time.sleep(delay)
+                continue
+
+            if response.status_code not in RETRY_STATUSES or attempt == self.max_retries:
+                if response.status_code < 400:
+                    self.limiter.succeeded()
+                return response
+
+            delay = retry_after(response)
+            if response.status_code in THROTTLE_STATUSES:
+                self.limiter.throttled(pause=delay)
+            if delay is None:
+                delay = backoff_delay(attempt)
+            logger.warning(f"{method} {url} returned {response.status_code}, retrying in {delay:.1f}s")
+            METRICS.inc('http_retries', reason=str(response.status_code))
+            time.sleep(delay)
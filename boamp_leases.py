@@ -0,0 +1,214 @@
+import logging
+import os
+import socket
+from collections import namedtuple
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
+
+# How long a claimed chunk stays with its worker without a heartbeat
+DEFAULT_LEASE_SECONDS = 300
+DEFAULT_CHUNK_DAYS = 7
+
+Chunk = namedtuple('Chunk', 'chunk_id published_from published_to cursor')
+
+
+def default_worker_id():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class ChunkLeases:
+    """Publication-date chunks of the dataset, leased to workers through Postgres.
+
+    plan() splits a date range into chunks in france_boamp_chunks. Any number
+    of workers, on any machines sharing the database, claim() the next free
+    chunk with FOR UPDATE SKIP LOCKED, so no two get the same one. A worker
+    renews its lease with heartbeat() after every page, which also records
+    the idweb cursor reached, and marks the chunk complete() at the end. A
+    lease that is not renewed in time expires and the chunk goes to the next
+    worker that claims, resuming from the stored cursor; completed chunks
+    are never handed out again. All times come from the database clock.
+    """
+
+    def __init__(self, db_conn):
+        self.db_conn = db_conn
+
+    def create_tables(self, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS france_boamp_chunks (
+                chunk_id SERIAL PRIMARY KEY,
+                published_from DATE NOT NULL,
+                published_to DATE NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker_id TEXT,
+                lease_until TIMESTAMP,
+                cursor_idweb TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                notices INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT NOW(),
+                UNIQUE (published_from, published_to)
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_boamp_chunks_status ON france_boamp_chunks(status)")
+
+    def plan(self, start, end, days=DEFAULT_CHUNK_DAYS):
+        """Add chunks of `days` covering [start, end); chunks already planned are kept"""
+        rows = []
+        day = start
+        while day < end:
+            rows.append((day, min(day + timedelta(days=days), end)))
+            day += timedelta(days=days)
+
+        cursor = self.db_conn.cursor()
+        cursor.executemany("""
+            INSERT INTO france_boamp_chunks (published_from, published_to)
+            VALUES (%s, %s)
+            ON CONFLICT (published_from, published_to) DO NOTHING
+        """, rows)
+        self.db_conn.commit()
+        logger.info(f"Planned {len(rows)} chunks of {days} days from {start} to {end}")
+        return len(rows)
+
+    def claim(self, worker_id, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Lease the newest pending or expired chunk to worker_id, or None when none is left"""
+        cursor = self.db_conn.cursor()
+        cursor.execute("""
+            UPDATE france_boamp_chunks SET
+                status = 'leased', worker_id = %s, attempts = attempts + 1,
+                lease_until = NOW() + %s * INTERVAL '1 second', updated_at = NOW()
+            WHERE chunk_id = (
+                SELECT chunk_id FROM france_boamp_chunks
+                WHERE status = 'pending' OR (status = 'leased' AND lease_until < NOW())
+                ORDER BY published_from DESC
+                LIMIT 1
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING chunk_id, published_from, published_to, cursor_idweb
+        """, (worker_id, lease_seconds))
+        row = cursor.fetchone()
+        self.db_conn.commit()
+        return Chunk(*row) if row else None
+
+    def heartbeat(self, chunk, worker_id, cursor_idweb, notices=0, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """Extend the lease and record progress; False if the lease was lost to another worker"""
+        cursor = self.db_conn.cursor()
+        cursor.execute("""
+            UPDATE france_boamp_chunks SET
+                lease_until = NOW() + %s * INTERVAL '1 second', cursor_idweb = %s,
+                notices = notices + %s, updated_at = NOW()
+            WHERE chunk_id = %s AND worker_id = %s AND status = 'leased'
+        """, (lease_seconds, cursor_idweb, notices, chunk.chunk_id, worker_id))
+        held = cursor.rowcount == 1
+        self.db_conn.commit()
+        return held
+
+    def complete(self, chunk, worker_id):
+        cursor = self.db_conn.cursor()
+        cursor.execute("""
+            UPDATE france_boamp_chunks SET status = 'done', lease_until = NULL, updated_at = NOW()
+            WHERE chunk_id = %s AND worker_id = %s AND status = 'leased'
+        """, (chunk.chunk_id, worker_id))
+        done = cursor.rowcount == 1
+        self.db_conn.commit()
+        return done
+
+    def release(self, chunk, worker_id):
+        """Hand a chunk back after a failure; the next claim resumes from its cursor"""
+        cursor = self.db_conn.cursor()
+        cursor.execute("""
+            UPDATE france_boamp_chunks SET status = 'pending', lease_until = NULL, updated_at = NOW()
+            WHERE chunk_id = %s AND worker_id = %s AND status = 'leased'
+        """, (chunk.chunk_id, worker_id))
+        self.db_conn.commit()
+
+    def progress(self):
+        """{status: chunk count} over all planned chunks"""
+        cursor = self.db_conn.cursor()
+        cursor.execute("SELECT status, COUNT(*) FROM france_boamp_chunks GROUP BY status")
+        return dict(cursor.fetchall())
+
+
+def check(dsn, workers=2, chunks=20):
+    """Exercise claim, heartbeat, expiry and resume against a throwaway Postgres
+
+    Everything happens in a scratch schema that is dropped afterwards:
+    `workers` threads, one connection each, drain `chunks` chunks and every
+    chunk must be completed by exactly one of them; then a worker "crashes"
+    holding a lease, which must be re-claimed after expiry from its last
+    cursor while the dead worker's heartbeat is refused.
+    """
+    import threading
+    import time
+    from datetime import date
+
+    import psycopg2
+
+    schema = 'boamp_lease_check'
+    admin = psycopg2.connect(dsn)
+    admin.cursor().execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE; CREATE SCHEMA {schema}")
+    admin.commit()
+
+    def connect():
+        return psycopg2.connect(dsn, options=f'-c search_path={schema}')
+
+    try:
+        conn = connect()
+        leases = ChunkLeases(conn)
+        leases.create_tables(conn.cursor())
+        conn.commit()
+
+        # Concurrent drain: SKIP LOCKED hands each chunk to one worker only
+        leases.plan(date(2024, 1, 1), date(2024, 1, 1) + timedelta(days=chunks), days=1)
+        done = []
+
+        def drain(worker_id):
+            own = ChunkLeases(connect())
+            while True:
+                chunk = own.claim(worker_id)
+                if chunk is None:
+                    break
+                assert own.heartbeat(chunk, worker_id, 'cursor', 1)
+                assert own.complete(chunk, worker_id)
+                done.append((chunk.chunk_id, worker_id))
+            own.db_conn.close()
+
+        threads = [threading.Thread(target=drain, args=(f'worker-{i}',)) for i in range(workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        ids = sorted(chunk_id for chunk_id, _ in done)
+        assert len(ids) == chunks and len(set(ids)) == chunks, f"chunks completed {ids}"
+        assert leases.progress() == {'done': chunks}, leases.progress()
+        logger.info(f"{chunks} chunks drained by {len({w for _, w in done})} of {workers} workers, none twice")
+
+        # Crash and reclaim: an expired lease resumes from the stored cursor
+        conn.cursor().execute("TRUNCATE france_boamp_chunks")
+        conn.commit()
+        leases.plan(date(2024, 1, 1), date(2024, 1, 2))
+        dead = leases.claim('dead', lease_seconds=1)
+        assert leases.heartbeat(dead, 'dead', '24-100', 10, lease_seconds=1)
+        assert leases.claim('live') is None, "a live lease was handed out"
+        time.sleep(1.5)
+        chunk = leases.claim('live')
+        assert chunk and chunk.chunk_id == dead.chunk_id and chunk.cursor == '24-100', chunk
+        assert not leases.heartbeat(dead, 'dead', '24-050'), "the dead worker kept its lease"
+        assert leases.complete(chunk, 'live')
+        assert leases.claim('other') is None, "a completed chunk was handed out again"
+        logger.info("Expired lease re-claimed from its cursor; completed chunk not re-issued")
+        conn.close()
+    finally:
+        admin.cursor().execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+        admin.commit()
+        admin.close()
+
+
+if __name__ == "__main__":
+    # python boamp_leases.py check  (BOAMP_DATABASE_URL: a throwaway Postgres)
+    import sys
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    if sys.argv[1:2] != ['check'] or not os.environ.get('BOAMP_DATABASE_URL'):
+        sys.exit("usage: BOAMP_DATABASE_URL=postgresql://... python boamp_leases.py check")
+    check(os.environ['BOAMP_DATABASE_URL'])
+    print("lease check passed")
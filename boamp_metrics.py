@@ -0,0 +1,253 @@
+import cProfile
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the latency buckets, from a single field lookup up
+# to a slow page fetch or LLM call
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Prefix of every exported Prometheus metric name
+PROMETHEUS_PREFIX = 'boamp_'
+
+
+class Histogram:
+    """Fixed-bucket latency histogram: per-bucket counts, total count and sum"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)    # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        return {'buckets': list(self.buckets), 'counts': list(self.counts), 'count': self.count, 'sum': self.sum}
+
+    def merge(self, snapshot):
+        for i, n in enumerate(snapshot['counts']):
+            self.counts[i] += n
+        self.count += snapshot['count']
+        self.sum += snapshot['sum']
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding quantile q (None when empty)"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(self.buckets + (float('inf'),), self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return float('inf')
+
+
+class Metrics:
+    """Process-wide registry of labelled histograms and counters
+
+    Observations take one lock and a bisect, cheap enough to leave on in
+    production. A run exports everything at the end with write() as a
+    Prometheus textfile (.prom) or JSON; worker processes hand their
+    observations back with drain() and the parent merge()s them.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self.histograms = {}    # (name, ((label, value), ...)) -> Histogram
+        self.counters = {}      # (name, ((label, value), ...)) -> number
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    def observe_many(self, name, label, samples):
+        """Record [(label value, seconds), ...] under one lock, e.g. every field of a notice"""
+        with self._lock:
+            for value, seconds in samples:
+                key = (name, ((label, value),))
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram(self.buckets)
+                histogram.observe(seconds)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """Time the block into histogram `name`, including when it raises"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def snapshot(self):
+        """Picklable copy of every histogram and counter"""
+        with self._lock:
+            return _snapshot(self.histograms, self.counters)
+
+    def reset(self):
+        with self._lock:
+            self.histograms = {}
+            self.counters = {}
+
+    def drain(self):
+        """snapshot() and reset() in one step, for shipping a worker's share to the parent"""
+        with self._lock:
+            histograms, counters = self.histograms, self.counters
+            self.histograms, self.counters = {}, {}
+        return _snapshot(histograms, counters)
+
+    def merge(self, snapshot):
+        with self._lock:
+            for name, labels, data in snapshot['histograms']:
+                key = (name, labels)
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram(tuple(data['buckets']))
+                histogram.merge(data)
+            for name, labels, value in snapshot['counters']:
+                key = (name, labels)
+                self.counters[key] = self.counters.get(key, 0) + value
+
+    def to_json(self):
+        """Histograms with count, sum, p50/p99 bucket bounds and raw buckets, plus counters"""
+        with self._lock:
+            histograms = [
+                {
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': h.count,
+                    'sum_seconds': h.sum,
+                    'p50_le': h.quantile(0.50),
+                    'p99_le': h.quantile(0.99),
+                    'buckets': dict(zip([str(b) for b in h.buckets] + ['+Inf'], h.counts)),
+                }
+                for (name, labels), h in sorted(self.histograms.items())
+            ]
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+        return {'histograms': histograms, 'counters': counters}
+
+    def to_prometheus(self, prefix=PROMETHEUS_PREFIX):
+        """Prometheus text exposition format, for node_exporter's textfile collector"""
+        def label_text(labels, extra=()):
+            pairs = [f'{k}="{_escape(v)}"' for k, v in tuple(labels) + tuple(extra)]
+            return '{' + ','.join(pairs) + '}' if pairs else ''
+
+        lines = []
+        with self._lock:
+            by_name = {}
+            for (name, labels), h in sorted(self.histograms.items()):
+                by_name.setdefault(name, []).append((labels, h))
+            for name, series in by_name.items():
+                lines.append(f'# TYPE {prefix}{name} histogram')
+                for labels, h in series:
+                    cumulative = 0
+                    for bound, n in zip(h.buckets + (float('inf'),), h.counts):
+                        cumulative += n
+                        le = '+Inf' if bound == float('inf') else repr(bound)
+                        lines.append(f'{prefix}{name}_bucket{label_text(labels, (("le", le),))} {cumulative}')
+                    lines.append(f'{prefix}{name}_sum{label_text(labels)} {h.sum!r}')
+                    lines.append(f'{prefix}{name}_count{label_text(labels)} {h.count}')
+
+            by_name = {}
+            for (name, labels), value in sorted(self.counters.items()):
+                by_name.setdefault(name, []).append((labels, value))
+            for name, series in by_name.items():
+                lines.append(f'# TYPE {prefix}{name}_total counter')
+                for labels, value in series:
+                    lines.append(f'{prefix}{name}_total{label_text(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """Export to `path`: Prometheus text for *.prom, JSON otherwise
+
+        The file is written next to its target and renamed into place, so a
+        textfile collector never reads a half-written file.
+        """
+        if path.endswith('.prom'):
+            content = self.to_prometheus()
+        else:
+            content = json.dumps(self.to_json(), indent=2)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        logger.info(f"Metrics written to {path}")
+
+    def summary(self, name):
+        """'label=value: n calls, total s' lines for one histogram, slowest total first"""
+        with self._lock:
+            series = [(labels, h) for (n, labels), h in self.histograms.items() if n == name]
+        series.sort(key=lambda item: -item[1].sum)
+        return [f"{','.join(f'{k}={v}' for k, v in labels) or name}: {h.count} calls, {h.sum:.2f}s"
+                for labels, h in series]
+
+
+def _snapshot(histograms, counters):
+    return {
+        'histograms': [(name, labels, h.snapshot()) for (name, labels), h in histograms.items()],
+        'counters': [(name, labels, value) for (name, labels), value in counters.items()],
+    }
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+@contextmanager
+def profiled(path):
+    """Profile the block into `path`: pyinstrument HTML for *.html (when installed), cProfile stats otherwise"""
+    if path.endswith('.html') and pyinstrument is not None:
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+        try:
+            yield
+        finally:
+            profiler.stop()
+            with open(path, 'w') as f:
+                f.write(profiler.output_html())
+            logger.info(f"Profile written to {path}")
+        return
+
+    if path.endswith('.html'):
+        logger.warning("pyinstrument not installed - writing cProfile stats instead")
+        path = path[:-len('.html')] + '.prof'
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        logger.info(f"Profile written to {path} (view with python -m pstats)")
+
+
+# Shared by every module of a run
+METRICS = Metrics()
@@ -0,0 +1,189 @@
+import codecs
+import gzip
+import json
+import re
+
+# Characters pulled from the source per read; a record larger than this is
+# assembled over several reads
+CHUNK_SIZE = 64 * 1024
+
+WHITESPACE_RE = re.compile(r'[ \t\n\r]*')
+
+_decoder = json.JSONDecoder()
+
+
+def iter_text(chunks, encoding='utf-8'):
+    """Decode an iterable of byte chunks to text, across split multi-byte characters"""
+    decoder = codecs.getincrementaldecoder(encoding)()
+    for chunk in chunks:
+        text = decoder.decode(chunk)
+        if text:
+            yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+
+def iter_file(f, chunk_size=CHUNK_SIZE):
+    """Chunks of an open file, text or binary"""
+    return iter(lambda: f.read(chunk_size), f.read(0))
+
+
+class JSONStream:
+    """Pull-parser over a JSON document arriving as text chunks
+
+    Only the structure around the records (the outer object or array) is
+    walked by hand; each value is decoded by json's C scanner as soon as its
+    last character has arrived. Only the value being decoded is buffered,
+    so memory is bounded by the largest record, not by the document.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, at_least=1):
+        """Append chunks until `at_least` more characters arrived; False at end of input"""
+        parts = [self.buf[self.pos:]]
+        added = 0
+        for chunk in self._chunks:
+            parts.append(chunk)
+            added += len(chunk)
+            if added >= at_least:
+                break
+        else:
+            self.eof = True
+        self.buf = ''.join(parts)
+        self.pos = 0
+        return added > 0
+
+    def peek(self):
+        """Next non-whitespace character, without consuming it ('' at end of input)"""
+        while True:
+            self.pos = WHITESPACE_RE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.eof or not self._fill():
+                return ''
+
+    def expect(self, char):
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected {char!r} in JSON stream, found {found or 'end of input'!r}")
+        self.pos += 1
+
+    def value(self):
+        """Decode the next complete JSON value"""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                # Incomplete: at least double what is buffered, so a large
+                # record is re-scanned a logarithmic number of times
+                if not self.eof and self._fill(max(CHUNK_SIZE, len(self.buf) - self.pos)):
+                    continue
+                raise
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue    # a number may go on in the next chunk
+            self.pos = end
+            return value
+
+    def items(self):
+        """Elements of the array starting here"""
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            separator = self.peek()
+            self.pos += 1
+            if separator == ']':
+                return
+            if separator != ',':
+                raise ValueError(f"Expected ',' or ']' in JSON array, found {separator or 'end of input'!r}")
+
+
+def iter_results(chunks, meta=None, key='results'):
+    """Records of the `key` array of a JSON object, e.g. an API page
+
+    The object's other members are stored in `meta` as they are reached
+    (OpenDataSoft sends total_count before the results).
+    """
+    stream = JSONStream(chunks)
+    stream.expect('{')
+    if stream.peek() == '}':
+        return
+    while True:
+        name = stream.value()
+        stream.expect(':')
+        if name == key and stream.peek() == '[':
+            yield from stream.items()
+        else:
+            value = stream.value()
+            if meta is not None:
+                meta[name] = value
+        separator = stream.peek()
+        stream.pos += 1
+        if separator == '}':
+            return
+        if separator != ',':
+            raise ValueError(f"Expected ',' or '}}' in JSON object, found {separator or 'end of input'!r}")
+
+
+def iter_array(chunks):
+    """Elements of a top-level JSON array, e.g. a /exports/json dump"""
+    return JSONStream(chunks).items()
+
+
+def iter_jsonl(chunks):
+    """Records of a JSON Lines stream, e.g. a /exports/jsonl dump"""
+    parts = []
+    for chunk in chunks:
+        if '\n' not in chunk:
+            parts.append(chunk)
+            continue
+        lines = chunk.split('\n')
+        parts.append(lines[0])
+        lines[0] = ''.join(parts)
+        parts = [lines.pop()]
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    line = ''.join(parts)
+    if line.strip():
+        yield json.loads(line)
+
+
+def batched(records, size):
+    """Lists of up to `size` consecutive records"""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def export_format(path):
+    """'jsonl' or 'json' from an export file name (optionally .gz)"""
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.jsonl'):
+        return 'jsonl'
+    if name.endswith('.json'):
+        return 'json'
+    raise ValueError(f"Unknown export format for {path} (expected .json or .jsonl, optionally .gz)")
+
+
+def iter_export(path, fmt=None):
+    """Stream the records of an OpenDataSoft export file (JSON or JSONL, optionally gzipped)"""
+    fmt = fmt or export_format(path)
+    opener = gzip.open if path.endswith('.gz') else open
+    with opener(path, 'rt', encoding='utf-8') as f:
+        records = iter_jsonl(iter_file(f)) if fmt == 'jsonl' else iter_array(iter_file(f))
+        yield from records
@@ -0,0 +1,349 @@
+import re
+from bisect import bisect_right
+
+from lxml import etree
+
+# Tags whose strings BeautifulSoup keeps out of get_text() of other elements
+STRING_CONTAINERS = {'script', 'style', 'template', 'rt', 'rp'}
+PRESERVE_WHITESPACE_TAGS = {'pre', 'textarea'}
+ASCII_SPACES = '\x20\x0a\x09\x0c\x0d'
+
+# Compiled once; evaluated against each notice's tree
+TITLE_XPATH = etree.XPath('(//title)[1]')
+BOLD_SPAN_XPATH = etree.XPath("//span[contains(@class, 'fr-text--bold')]")
+
+# One scan of the raw HTML finds every section opening tag and every
+# '</div> <hr>' that closes a section body
+SECTION_PREFIX = 'section_'
+SECTION_SPLIT_RE = re.compile(r'id="(section_[^"]*)"[^>]*>|</div>\s*<hr')
+
+
+class Section:
+    """One `section_*` block of a notice: its element, raw HTML body and text
+
+    `html` is the source between the section's opening tag and the first
+    '</div>' followed by '<hr>', the layout of BOAMP's plain-text award
+    sections; it is None when the section is not closed that way. `node` is
+    None when the id only appears in the raw HTML.
+    """
+
+    def __init__(self, tree, section_id, node, html):
+        self.tree = tree
+        self.id = section_id
+        self.node = node
+        self.html = html
+        self._text = None
+
+    @property
+    def text(self):
+        """get_text() of the section element"""
+        if self._text is None:
+            self._text = self.tree.text(self.node) if self.node is not None else ''
+        return self._text
+
+
+class NoticeTree:
+    """One lxml parse of a notice, shared by every extractor.
+
+    The tree is walked once into a flat, document-ordered list of strings
+    (pos, text, kind, parent) and the position range of every element, which
+    is enough to answer get_text(), find_next() and string searches with the
+    same results BeautifulSoup(html, 'lxml') gave: whitespace-only strings are
+    collapsed outside <pre>/<textarea>, and comments, the doctype and
+    script/style contents are searchable but left out of element text.
+
+    Elements with an id are collected during the same walk, so by_id() and
+    the `sections` map never search the tree.
+
+    A document with no elements at all yields an empty tree.
+    """
+
+    def __init__(self, html):
+        self.html = html
+        self.strings = []    # (pos, text, kind, parent element or None for the document)
+        self.spans = {}      # element -> (start_pos, end_pos)
+        self.elements = []   # (start_pos, element) in document order
+        self.with_id = []    # elements carrying an id attribute, in document order
+        self.ids = {}        # id -> first element carrying it
+        self._sections = None
+        self.root = self._parse(html)
+        if self.root is not None:
+            self._index()
+        self._string_pos = [entry[0] for entry in self.strings]
+        self._element_pos = [entry[0] for entry in self.elements]
+
+    @staticmethod
+    def _parse(html):
+        if html and html[0] == '\N{BYTE ORDER MARK}':
+            html = html[1:]
+        parser = etree.HTMLParser(recover=True, default_doctype=False)
+        try:
+            parser.feed(html or '')
+            return parser.close()
+        except etree.ParserError:
+            return None
+
+    def _index(self):
+        pos = 0
+
+        def add(text, kind, parent, preserve):
+            nonlocal pos
+            if not preserve and not text.strip(ASCII_SPACES):
+                text = '\n' if '\n' in text else ' '
+            pos += 1
+            self.strings.append((pos, text, kind, parent))
+
+        def visit(node, parent, kind, preserve):
+            nonlocal pos
+            tag = node.tag
+            if tag is etree.Comment:
+                add(node.text or '', 'comment', parent, preserve)
+                return
+            if tag is etree.PI:
+                add(f"{node.target} {node.text or ''}", 'pi', parent, preserve)
+                return
+            if not isinstance(tag, str):
+                return
+
+            pos += 1
+            start = pos
+            self.elements.append((start, node))
+            element_id = node.get('id')
+            if element_id is not None:
+                self.with_id.append(node)
+                self.ids.setdefault(element_id, node)
+            if tag in STRING_CONTAINERS:
+                kind = tag
+            inner = preserve or tag in PRESERVE_WHITESPACE_TAGS
+            if node.text:
+                add(node.text, kind, node, inner)
+            for child in node:
+                visit(child, node, kind, inner)
+                if child.tail:
+                    add(child.tail, kind, node, inner)
+            self.spans[node] = (start, pos)
+
+        docinfo = self.root.getroottree().docinfo
+        if docinfo.doctype:
+            doctype = docinfo.root_name or ''
+            if docinfo.public_id is not None:
+                doctype += f' PUBLIC "{docinfo.public_id}"'
+                if docinfo.system_url is not None:
+                    doctype += f' "{docinfo.system_url}"'
+            elif docinfo.system_url is not None:
+                doctype += f' SYSTEM "{docinfo.system_url}"'
+            pos += 1
+            self.strings.append((pos, doctype, 'doctype', None))
+
+        for node in reversed(list(self.root.itersiblings(preceding=True))):
+            visit(node, None, 'text', False)
+        visit(self.root, None, 'text', False)
+        for node in self.root.itersiblings():
+            visit(node, None, 'text', False)
+
+    def _strings_in(self, element):
+        if element is None:
+            return self.strings
+        start, end = self.spans[element]
+        return self.strings[bisect_right(self._string_pos, start):bisect_right(self._string_pos, end)]
+
+    def text(self, element=None, separator='', strip=False):
+        """get_text() of an element, or of the whole document when None"""
+        kind = element.tag if element is not None and element.tag in STRING_CONTAINERS else 'text'
+        parts = (text for _, text, string_kind, _ in self._strings_in(element) if string_kind == kind)
+        if strip:
+            parts = (text.strip() for text in parts)
+            parts = (text for text in parts if text)
+        return separator.join(parts)
+
+    def first(self, xpath, **variables):
+        """First element matched by a compiled XPath, or None"""
+        if self.root is None:
+            return None
+        found = xpath(self.root, **variables)
+        return found[0] if found else None
+
+    def by_id(self, element_id):
+        return self.ids.get(element_id)
+
+    @property
+    def sections(self):
+        """Section id -> Section for every `section_*` block, built on first use
+
+        One pass of SECTION_SPLIT_RE over the raw HTML cuts out every section
+        body at once; section-scoped extractors share the result instead of
+        each running its own DOTALL search over the whole document.
+        """
+        if self._sections is None:
+            bodies = {}
+            pending = []
+            for match in SECTION_SPLIT_RE.finditer(self.html or ''):
+                section_id = match.group(1)
+                if section_id is None:
+                    for open_id, start in pending:
+                        bodies[open_id] = self.html[start:match.start()]
+                    pending = []
+                elif section_id not in bodies:
+                    pending.append((section_id, match.end()))
+                    bodies[section_id] = None
+
+            section_ids = [i for i in self.ids if i.startswith(SECTION_PREFIX)]
+            section_ids += [i for i in bodies if i not in self.ids]
+            self._sections = {i: Section(self, i, self.ids.get(i), bodies.get(i)) for i in section_ids}
+        return self._sections
+
+    def find_strings(self, pattern):
+        """All strings (any kind, as find_all(string=...)) matching a compiled regex"""
+        return [entry for entry in self.strings if pattern.search(entry[1])]
+
+    def find_next(self, after, tags):
+        """First element named in `tags` after position/element `after`, like find_next()"""
+        if not isinstance(after, int):
+            after = self.spans[after][0] if after is not None else 0
+        for _, element in self.elements[bisect_right(self._element_pos, after):]:
+            if element.tag in tags:
+                return element
+        return None
+
+
+class LabelIndex:
+    """Label -> value index of one notice, built from its NoticeTree.
+
+    Records every `fr-text--bold` label span (with its parent's value text),
+    every text node and every element id in document order, so field lookups
+    no longer walk the tree. Section scoping (e.g. 'section_4') is a position
+    range over the same flat lists. Lookups are memoized per (pattern, section),
+    and prefetch() resolves all the patterns of a section in one pass.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.labels = []      # (pos, label_text, value_text, label_string)
+        self.scopes = []      # (id, start_pos, end_pos) in document order
+        self._cache = {}
+        self._hits = {}       # (pattern, section) -> (first label value, first matching string)
+        if tree.root is not None:
+            self._index(tree)
+        self._label_pos = [entry[0] for entry in self.labels]
+
+    def _index(self, tree):
+        for span in BOLD_SPAN_XPATH(tree.root):
+            if 'fr-text--bold' not in span.get('class').split():
+                continue
+            label = tree.text(span)
+            value = tree.text(span.getparent()).replace(label, '').strip()
+            self.labels.append((tree.spans[span][0], label, value, self._string(span)))
+
+        for element in tree.with_id:
+            start, end = tree.spans[element]
+            self.scopes.append((element.get('id'), start, end))
+
+    @staticmethod
+    def _string(element):
+        """BeautifulSoup's .string: the only child string, looking through single children"""
+        while True:
+            children = len(element) + sum(1 for child in element if child.tail)
+            if element.text:
+                children += 1
+            if children != 1:
+                return None
+            if element.text:
+                return element.text
+            element = element[0]
+            if element.tag is etree.Comment:
+                return element.text or ''
+            if element.tag is etree.PI:
+                return f"{element.target} {element.text or ''}"
+
+    def _range(self, section):
+        """Position range for a section (id regex or element), or the whole document"""
+        if isinstance(section, str):
+            section_re = re.compile(section)
+            for tag_id, start, end in self.scopes:
+                if section_re.search(tag_id):
+                    return start, end
+        elif section is not None:
+            return self.tree.spans[section]
+        return 0, float('inf')
+
+    def prefetch(self, patterns, section=None):
+        """Resolve many patterns over one section in a single pass over its labels and strings
+
+        For each pattern this finds the first label with a usable value and
+        the first matching string, which is all get() needs, so every field
+        scoped to the same section shares one scan.
+        """
+        pending = {p: re.compile(p, re.IGNORECASE) for p in patterns if (p, section) not in self._hits}
+        if not pending:
+            return
+
+        start, end = self._range(section)
+        string_pos = self.tree._string_pos
+        labels = self.labels[bisect_right(self._label_pos, start):bisect_right(self._label_pos, end)]
+        strings = self.tree.strings[bisect_right(string_pos, start):bisect_right(string_pos, end)]
+
+        # Multi-lot notices repeat the same label and string texts once per
+        # lot; a text seen before cannot be the first match of anything, so
+        # only the first occurrence of each is searched
+        label_hits = {}
+        remaining = dict(pending)
+        seen = set()
+        for _, label, value, _ in labels:
+            if not value or value == ':' or label in seen:
+                continue
+            seen.add(label)
+            for pattern, pattern_re in list(remaining.items()):
+                if pattern_re.search(label):
+                    label_hits[pattern] = value
+                    del remaining[pattern]
+            if not remaining:
+                break
+
+        string_hits = {}
+        remaining = dict(pending)
+        seen = set()
+        for entry in strings:
+            if entry[1] in seen:
+                continue
+            seen.add(entry[1])
+            for pattern, pattern_re in list(remaining.items()):
+                if pattern_re.search(entry[1]):
+                    string_hits[pattern] = entry
+                    del remaining[pattern]
+            if not remaining:
+                break
+
+        for pattern in pending:
+            self._hits[(pattern, section)] = (label_hits.get(pattern), string_hits.get(pattern))
+
+    def get(self, field_patterns, section=None):
+        """Return the value for the first matching pattern, as extract_field did"""
+        if isinstance(field_patterns, str):
+            field_patterns = [field_patterns]
+
+        key = (tuple(field_patterns), section)
+        if key not in self._cache:
+            self._cache[key] = self._lookup(field_patterns, section)
+        return self._cache[key]
+
+    def _lookup(self, field_patterns, section):
+        self.prefetch(field_patterns, section)
+
+        for pattern in field_patterns:
+            value, string = self._hits[(pattern, section)]
+            if value:
+                return value
+            if string is None:
+                continue
+
+            parent = string[3]
+            parent_div = parent.getparent() if parent is not None else None
+            full_text = self.tree.text(parent_div)
+            parts = re.compile(pattern, re.IGNORECASE).split(full_text, maxsplit=1)
+            if len(parts) > 1:
+                value = parts[1].strip().lstrip(':').strip()
+                value = re.split(r'\n|<span', value)[0].strip()
+                if value:
+                    return value
+
+        return None
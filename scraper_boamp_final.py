@@ -1,15 +1,16 @@
 import requests
 import os
 from datetime import datetime
-from bs4 import BeautifulSoup, XMLParsedAsHTMLWarning
-import warnings
 import psycopg2
 from psycopg2.extras import execute_values
-import time
-import re
 import logging
-
-warnings.filterwarnings("ignore", category=XMLParsedAsHTMLWarning)
+from boamp_api import BASE_URL, stream_page
+from boamp_html_store import HtmlStore, content_hash
+from boamp_cache import DEFAULT_CACHE_DIR, CachingSession, ResponseCache
+from boamp_http import DEFAULT_RATE, HttpClient
+from boamp_fields import FieldExtractor
+from boamp_metrics import METRICS
+import argparse
 
 logging.basicConfig(
     level=logging.INFO,
@@ -17,11 +18,29 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# france_boamp_parsed fields, from the shared field registry
+PARSED_EXTRACTOR = FieldExtractor(['title', 'notice_number', 'notice_type', 'department', 'contract_amounts'])
+
+# New notices are inserted and stored ones left alone. A replay re-parses
+# recorded HTML into rows that still hold that same HTML, so a notice amended
+# since the recording is never rolled back
+INSERT_CLAUSE = "ON CONFLICT (idweb) DO NOTHING"
+REPLAY_CLAUSE = """ON CONFLICT (idweb) DO UPDATE SET
+    title = EXCLUDED.title, notice_number = EXCLUDED.notice_number, notice_type = EXCLUDED.notice_type,
+    department = EXCLUDED.department, contract_amounts = EXCLUDED.contract_amounts,
+    scraped_at = EXCLUDED.scraped_at
+    WHERE france_boamp_parsed.content_hash = EXCLUDED.content_hash"""
+
 class BOAMPScraper:
-    def __init__(self):
-        self.base_url = "https://www.boamp.fr/api/explore/v2.1/catalog/datasets/boamp-html/records"
+    def __init__(self, cache_dir=None, replay=False):
+        self.base_url = BASE_URL
+        self.replay = bool(replay)
         self.db_conn = self.connect_db()
-        self.session = requests.Session()
+        self.session = HttpClient(rate=float(os.environ.get('BOAMP_API_RATE', DEFAULT_RATE)))
+        if cache_dir or replay:
+            self.session = CachingSession(self.session, ResponseCache(cache_dir or DEFAULT_CACHE_DIR), replay=bool(replay),
+                                          run=replay if isinstance(replay, str) else None)
+        self.html_store = HtmlStore(self.db_conn)
         
     def connect_db(self):
         try:
@@ -38,78 +57,41 @@ class BOAMPScraper:
             logger.error(f"Database connection failed: {e}")
             raise
     
-    def fetch_tenders(self, limit=100, offset=0):
-        params = {
-            'limit': limit,
-            'offset': offset,
-            'order_by': 'idweb DESC',
-            'where': 'html IS NOT NULL'
-        }
-        
+    def fetch_tenders(self, limit=100, before=None):
         try:
-            response = self.session.get(self.base_url, params=params, timeout=30)
-            response.raise_for_status()
+            page = stream_page(self.session, self.base_url, limit=limit, before=before)
             
-            data = response.json()
-            results = data.get('results', [])
-            total_count = data.get('total_count', 0)
+            valid_results = [r for r in page if r.get('html') and len(r.get('html', '')) > 100]
+            total_count, cursor = page.total_count, page.cursor
             
-            valid_results = [r for r in results if r.get('html') and len(r.get('html', '')) > 100]
-            
-            logger.info(f"Fetched {len(results)} tenders from offset {offset} (total available: {total_count})")
-            if len(valid_results) < len(results):
-                logger.warning(f"  Filtered out {len(results) - len(valid_results)} incomplete records")
+            logger.info(f"Fetched {page.count} tenders below idweb {before} (remaining: {total_count})")
+            if len(valid_results) < page.count:
+                logger.warning(f"  Filtered out {page.count - len(valid_results)} incomplete records")
             
             if valid_results:
                 idwebs = [r.get('idweb') for r in valid_results[:5]]
                 logger.info(f"  Sample idwebs: {idwebs}")
             
-            return valid_results, total_count
+            return valid_results, total_count, cursor
             
         except requests.exceptions.RequestException as e:
-            logger.error(f"Error fetching tenders at offset {offset}: {e}")
-            return [], 0
+            # The client already retried; an empty page here would end the run as if complete
+            logger.error(f"Error fetching tenders below idweb {before}: {e}")
+            raise
     
     def parse_tender(self, tender_data):
         html = tender_data.get('html', '')
-        soup = BeautifulSoup(html, 'lxml-xml')
-        
-        if not soup.find():
-            soup = BeautifulSoup(html, 'lxml')
-        
-        title_tag = soup.find('title')
-        title = title_tag.text.strip() if title_tag else None
-        
-        notice_num = None
-        annonce = soup.find(string=re.compile(r'Annonce n°', re.IGNORECASE))
-        if annonce:
-            strong = annonce.find_next('strong')
-            if strong:
-                notice_num = strong.text.strip()
-        
-        notice_type = None
-        doc_titre = soup.find(id='doc_titre')
-        if doc_titre:
-            notice_type = doc_titre.text.strip()
-        
-        department = None
-        dept = soup.find(string=re.compile(r'Département', re.IGNORECASE))
-        if dept:
-            dept_num = dept.find_next('strong')
-            if dept_num:
-                department = dept_num.text.strip()
-        
-        amounts = re.findall(r'(\d[\d\s,]*)\s*euro\(s\)\s*(?:HT|Ht|ht)', html, re.IGNORECASE)
-        contract_amounts = ','.join([a.replace(' ', '').replace(',', '') for a in amounts[:3]]) if amounts else None
+        data = PARSED_EXTRACTOR.extract(html, metrics=METRICS)
         
         return {
             'idweb': tender_data.get('idweb'),
-            'title': title,
-            'notice_number': notice_num,
-            'notice_type': notice_type,
-            'department': department,
-            'contract_amounts': contract_amounts,
+            'title': data['title'],
+            'notice_number': data['notice_number'],
+            'notice_type': data['notice_type'],
+            'department': data['department'],
+            'contract_amounts': data['contract_amounts'],
             'html_content': html,
+            'content_hash': content_hash(html),
             'scraped_at': datetime.now()
         }
     
@@ -130,11 +112,18 @@ class BOAMPScraper:
                     department TEXT,
                     contract_amounts TEXT,
                     html_content TEXT,
+                    content_hash TEXT,
                     scraped_at TIMESTAMP DEFAULT NOW(),
                     created_at TIMESTAMP DEFAULT NOW()
                 )
             """)
             
+            # Raw HTML is stored compressed in france_boamp_html, not inline
+            cursor.execute("ALTER TABLE france_boamp_parsed ADD COLUMN IF NOT EXISTS content_hash TEXT")
+            self.html_store.create_tables(cursor)
+            if self.html_store.dict_id is None:
+                self.html_store.load_dictionaries()
+            
             cursor.execute("""
                 CREATE INDEX IF NOT EXISTS idx_france_boamp_idweb 
                 ON france_boamp_parsed(idweb)
@@ -148,7 +137,7 @@ class BOAMPScraper:
                     t['notice_type'], 
                     t['department'], 
                     t['contract_amounts'], 
-                    t['html_content'], 
+                    t['content_hash'], 
                     t['scraped_at']
                 ) 
                 for t in tenders
@@ -157,18 +146,25 @@ class BOAMPScraper:
             logger.info(f"  Attempting to insert {len(values)} records...")
             logger.info(f"  First idweb: {values[0][0]}")
             
-            execute_values(cursor, """
-                INSERT INTO france_boamp_parsed 
-                (idweb, title, notice_number, notice_type, department, 
-                 contract_amounts, html_content, scraped_at)
-                VALUES %s
-                ON CONFLICT (idweb) DO NOTHING
-            """, values)
-            
-            saved_count = cursor.rowcount
-            self.db_conn.commit()
+            with METRICS.timer('db_write_seconds', op='insert'):
+                written = execute_values(cursor, f"""
+                    INSERT INTO france_boamp_parsed 
+                    (idweb, title, notice_number, notice_type, department, 
+                     contract_amounts, content_hash, scraped_at)
+                    VALUES %s
+                    {REPLAY_CLAUSE if self.replay else INSERT_CLAUSE}
+                    RETURNING idweb
+                """, values, fetch=True)
+                
+                saved_count = len(written)
+                written_ids = {idweb for (idweb,) in written}
+                self.html_store.put_many(cursor, [t for t in tenders if t['idweb'] in written_ids])
+                self.db_conn.commit()
             
-            logger.info(f"Saved {saved_count} new tenders (skipped {len(tenders) - saved_count} duplicates)")
+            if self.replay:
+                logger.info(f"Re-parsed {saved_count} tenders (kept {len(tenders) - saved_count} amended since)")
+            else:
+                logger.info(f"Saved {saved_count} new tenders (skipped {len(tenders) - saved_count} duplicates)")
             return saved_count
             
         except Exception as e:
@@ -179,13 +175,14 @@ class BOAMPScraper:
     def run(self, total_records=1000, batch_size=100, max_consecutive_zeros=5):
         logger.info(f"Starting BOAMP scrape for up to {total_records} records...")
         
-        offset = 0
+        cursor = None
+        fetched = 0
         total_processed = 0
         total_saved = 0
         consecutive_zeros = 0
         
-        while offset < total_records:
-            raw_tenders, total_available = self.fetch_tenders(limit=batch_size, offset=offset)
+        while fetched < total_records:
+            raw_tenders, _, cursor = self.fetch_tenders(limit=batch_size, before=cursor)
             
             if not raw_tenders:
                 logger.warning("No tenders returned, stopping")
@@ -205,7 +202,8 @@ class BOAMPScraper:
             total_processed += len(parsed)
             total_saved += saved_count
             
-            if saved_count == 0:
+            if saved_count == 0 and not self.replay:
+                # A replay goes through its whole recording
                 consecutive_zeros += 1
                 logger.warning(f"No new records saved ({consecutive_zeros}/{max_consecutive_zeros})")
                 
@@ -215,16 +213,14 @@ class BOAMPScraper:
             else:
                 consecutive_zeros = 0
             
-            offset += batch_size
+            fetched += batch_size
             
-            if offset >= total_available:
-                logger.info(f"Reached end of available records ({total_available})")
+            if cursor is None:
+                logger.info("Reached end of available records")
                 break
-            
-            time.sleep(2)
         
         logger.info("="*60)
-        logger.info(f"Scraping complete!")
+        logger.info("Scraping complete!")
         logger.info(f"Total processed: {total_processed}")
         logger.info(f"Total saved (new): {total_saved}")
         logger.info(f"Total duplicates: {total_processed - total_saved}")
@@ -238,9 +234,19 @@ class BOAMPScraper:
             logger.info("Database connection closed")
 
 if __name__ == "__main__":
-    scraper = BOAMPScraper()
+    parser = argparse.ArgumentParser(description="BOAMP scraper")
+    parser.add_argument('--cache-dir', help="record raw API pages under this directory")
+    parser.add_argument('--replay', nargs='?', const=True, default=False, metavar='RUN',
+                        help="re-run a recorded run (default: the latest) from the cache instead of the network")
+    parser.add_argument('--metrics-out', default=os.environ.get('BOAMP_METRICS_OUT'),
+                        help="write field/HTTP/DB timings here at the end (.prom for Prometheus, else JSON)")
+    args = parser.parse_args()
+
+    scraper = BOAMPScraper(cache_dir=args.cache_dir, replay=args.replay)
     scraper.run(
         total_records=10000,
         batch_size=100,
         max_consecutive_zeros=5
     )
+    if args.metrics_out:
+        METRICS.write(args.metrics_out)
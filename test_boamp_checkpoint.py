@@ -0,0 +1,68 @@
+from boamp_api import checkpoint_key, keyset_where, newest_checkpoint, stream_page
+
+# '25-100000' is the notice after '25-99999', but sorts before it as text
+OLD = {'idweb': '25-99999', 'dateparution': '2025-03-10', 'html': '<html/>'}
+NEW = {'idweb': '25-100000', 'dateparution': '2025-03-11', 'html': '<html/>'}
+
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, body):
+        self.body = body
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, *bodies):
+        self.bodies = list(bodies)
+        self.params = []
+
+    def get(self, url, params=None, **kwargs):
+        self.params.append(params)
+        return FakeResponse(self.bodies.pop(0))
+
+
+def test_newest_checkpoint_crosses_100000():
+    assert max(OLD['idweb'], NEW['idweb']) == '25-99999'
+    assert newest_checkpoint([OLD, NEW]) == ('2025-03-11', '25-100000')
+    assert newest_checkpoint([NEW, OLD]) == ('2025-03-11', '25-100000')
+    assert checkpoint_key(NEW) > checkpoint_key(OLD)
+
+
+def test_newest_checkpoint_skips_undated_records():
+    assert newest_checkpoint([{'idweb': '25-1', 'html': ''}]) is None
+    assert newest_checkpoint([]) is None
+
+
+def test_since_window_keeps_later_days_whatever_their_idweb():
+    where = keyset_where(since=checkpoint_key(OLD))
+    assert "dateparution > date'2025-03-10'" in where
+    assert "dateparution = date'2025-03-10' AND idweb > \"25-99999\"" in where
+
+
+def test_since_window_without_idweb_starts_at_the_day():
+    assert keyset_where(since=('2025-03-10', None)).endswith("dateparution >= date'2025-03-10'")
+
+
+def test_since_walk_crosses_100000():
+    session = FakeSession(
+        {'total_count': 3, 'results': [OLD]},
+        {'total_count': 2, 'results': [NEW]},
+    )
+    first = stream_page(session, limit=1, since=('2025-03-10', None))
+    assert [r['idweb'] for r in first] == ['25-99999']
+    assert first.cursor == ('2025-03-10', '25-99999')
+
+    second = stream_page(session, limit=1, since=first.cursor)
+    assert [r['idweb'] for r in second] == ['25-100000']
+    assert second.cursor == ('2025-03-11', '25-100000')
+
+    for params in session.params:
+        assert params['order_by'] == 'dateparution ASC, idweb ASC'
+    assert "dateparution > date'2025-03-10'" in session.params[1]['where']